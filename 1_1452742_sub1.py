@@ -1,102 +1,27 @@
+import tempfile
+from pathlib import Path
+
+import pandas as pd
 import streamlit as st
 from PIL import Image
-import numpy as np
-import cv2
-
-
-def pil_to_np_rgb(pil_image: Image.Image) -> np.ndarray:
-    return np.array(pil_image.convert("RGB"))
-
-
-def np_gray_to_pil(gray: np.ndarray) -> Image.Image:
-    return Image.fromarray(gray)
-
-def deskew(gray: np.ndarray) -> np.ndarray:
-    """
-    이미지의 기울기를 추정해서 자동으로 회전 보정
-    입력: grayscale 이미지 (numpy)
-    출력: 회전 보정된 grayscale 이미지
-    """
-    # 이진화 (윤곽 검출용)
-    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-
-    # 글자 영역 좌표 추출
-    coords = np.column_stack(np.where(bw > 0))
-    if len(coords) == 0:
-        return gray
-
-    # 최소 사각형으로 각도 계산
-    angle = cv2.minAreaRect(coords)[-1]
-
-    # OpenCV 각도 보정
-    if angle < -45:
-        angle = -(90 + angle)
-    else:
-        angle = -angle
-
-    (h, w) = gray.shape
-    center = (w // 2, h // 2)
-
-    # 회전 행렬 생성
-    M = cv2.getRotationMatrix2D(center, angle, 1.0)
-    rotated = cv2.warpAffine(
-        gray,
-        M,
-        (w, h),
-        flags=cv2.INTER_CUBIC,
-        borderMode=cv2.BORDER_REPLICATE,
-    )
 
-    return rotated
-
-def preprocess_pipeline(
-    pil_image: Image.Image,
-    use_gray: bool = True,
-    use_denoise: bool = True,
-    denoise_strength: int = 5,
-    use_contrast: bool = True,
-    contrast_alpha: float = 1.5,
-    contrast_beta: int = 0,
-    use_binarize: bool = True,
-    thresh: int = 160,
-    use_deskew: bool = True,
-) -> Image.Image:
-    """
-    실습과제1 전처리 파이프라인 (옵션형)
-    - gray: 컬러 제거(밝기만 남김)
-    - denoise: 잡음 제거(글자 주변 점/얼룩 감소)
-    - contrast: 대비 향상(글자 더 진하게/배경 더 옅게)
-    - binarize: 이진화(배경/글자 흑백 분리)
-    """
-    img = pil_to_np_rgb(pil_image)
-
-    # 1) 그레이스케일
-    if use_gray:
-        x = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-    else:
-        # gray를 안 쓰면 이후 단계들이 애매해져서, 최소한 gray 형태로 맞춰준다
-        x = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-
-    # 2) 노이즈 제거 (Median Blur)
-    # denoise_strength는 홀수여야 함(3,5,7...)
-    if use_denoise:
-        k = denoise_strength if denoise_strength % 2 == 1 else denoise_strength + 1
-        x = cv2.medianBlur(x, k)
-
-    # 3) 대비 개선
-    # x' = alpha*x + beta
-    if use_contrast:
-        x = cv2.convertScaleAbs(x, alpha=contrast_alpha, beta=contrast_beta)
-
-    # 4) 이진화
-    if use_binarize:
-        # 고정 임계값 이진화 (원하는 값으로 조절)
-        _, x = cv2.threshold(x, thresh, 255, cv2.THRESH_BINARY)
-
-    if use_deskew:
-        x = deskew(x)
-
-    return np_gray_to_pil(x)
+from doc_preprocess import (
+    DESKEW_METHODS,
+    TILED_MIN_PIXELS,
+    StageCache,
+    image_digest,
+    load_rgb,
+    preprocess_cached,
+    preprocess_tiled,
+)
+
+PREVIEW_WIDTH = 1600  # 큰 스캔은 화면에 이 폭으로 줄여서 표시
+
+
+@st.cache_resource
+def get_stage_cache() -> StageCache:
+    # 세션/rerun 사이에 공유하는 단계별 결과 캐시 (메모리 상한 있음)
+    return StageCache()
 
 
 st.set_page_config(page_title="AI 아카이브 - 실습과제1", layout="wide")
@@ -109,7 +34,7 @@ st.write(
     "- 이진화: 배경(흰) / 글자(검)로 딱 분리"
 )
 
-uploaded = st.file_uploader("이미지 파일을 업로드하세요 (png/jpg)", type=["png", "jpg", "jpeg"])
+uploaded = st.file_uploader("이미지 파일을 업로드하세요 (png/jpg/tiff)", type=["png", "jpg", "jpeg", "tif", "tiff"])
 
 # 전처리 옵션 UI
 st.sidebar.header("전처리 옵션")
@@ -127,15 +52,17 @@ use_binarize = st.sidebar.checkbox("4) 이진화", value=True)
 thresh = st.sidebar.slider("이진화 임계값(threshold)", min_value=0, max_value=255, value=160, step=1)
 
 use_deskew = st.sidebar.checkbox("5) 기울기(회전) 보정", value=True)
+deskew_method = st.sidebar.selectbox(
+    "기울기 추정 방식",
+    DESKEW_METHODS,
+    help="projection/hough: 축소본에서 각도 추정(빠름), minarearect: 예전 방식(원본 전체 픽셀 사용)",
+)
 
 if uploaded is None:
     st.info("이미지를 업로드하면 전/후 비교가 나타납니다.")
     st.stop()
 
-orig_pil = Image.open(uploaded).convert("RGB")
-
-processed_pil = preprocess_pipeline(
-    orig_pil,
+params = dict(
     use_gray=use_gray,
     use_denoise=use_denoise,
     denoise_strength=denoise_strength,
@@ -145,17 +72,71 @@ processed_pil = preprocess_pipeline(
     use_binarize=use_binarize,
     thresh=thresh,
     use_deskew=use_deskew,
+    deskew_method=deskew_method,
+)
+
+with Image.open(uploaded) as probe:  # 헤더만 읽음 (디코드 없음)
+    width, height = probe.size
+uploaded.seek(0)
+
+if width * height >= TILED_MIN_PIXELS:
+    # 아주 큰 스캔: 전체 배열 사본을 여러 장 만들지 않도록 띠 단위로 처리 (단계 캐시는 안 씀)
+    with tempfile.TemporaryDirectory() as tmp:
+        src_path = Path(tmp) / f"input{Path(uploaded.name).suffix.lower()}"
+        src_path.write_bytes(uploaded.getbuffer())
+        dst_path = Path(tmp) / "processed.png"
+        with st.spinner(f"큰 이미지({width}x{height})를 띠 단위로 처리하는 중..."):
+            result = preprocess_tiled(src_path, dst_path, tmp_dir=tmp, preview_width=PREVIEW_WIDTH, **params)
+        processed_png = dst_path.read_bytes()
+
+    st.sidebar.header("단계별 처리 시간")
+    st.sidebar.dataframe(
+        pd.DataFrame([{"단계": t["stage"], "ms": round(t["ms"], 1)} for t in result["timings"]]),
+        hide_index=True,
+    )
+
+    st.info(f"{width}x{height} 이미지라 띠 단위로 처리했습니다. 화면에는 폭 {PREVIEW_WIDTH}px 축소본을 보여줍니다.")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("원본 이미지 (축소)")
+        st.image(result["original_preview"], use_container_width=True)
+    with col2:
+        st.subheader("전처리 결과 (축소)")
+        st.image(result["preview"], use_container_width=True)
+        st.download_button("전처리 결과 PNG (원본 크기)", processed_png, file_name="processed.png", mime="image/png")
+    st.stop()
+
+# 옵션이 바뀐 첫 단계부터만 다시 계산 (원본 디코드/앞 단계 결과는 캐시에서)
+cache = get_stage_cache()
+data = uploaded.getvalue()
+digest = image_digest(data)
+orig_rgb, _ = load_rgb(data, cache, digest)
+
+processed, timings = preprocess_cached(data, cache, digest, **params)
+
+st.sidebar.header("단계별 처리 시간")
+st.sidebar.dataframe(
+    pd.DataFrame([
+        {
+            "단계": t["stage"],
+            "ms": round(t["ms"], 1),
+            "상태": "꺼짐" if t.get("off") else ("캐시" if t["cached"] else "계산"),
+        }
+        for t in timings
+    ]),
+    hide_index=True,
 )
+st.sidebar.caption(f"캐시 {len(cache)}개, {cache.nbytes / 1024 / 1024:.1f}MB / {cache.max_bytes / 1024 / 1024:.0f}MB")
 
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("원본 이미지")
-    st.image(orig_pil, use_container_width=True)
+    st.image(orig_rgb, use_container_width=True)
 
 with col2:
     st.subheader("전처리 결과")
-    st.image(processed_pil, use_container_width=True)
+    st.image(processed, use_container_width=True)
 
 st.divider()
 st.write("✅ 다음 단계에서: **기울기(회전) 보정**을 추가해서 삐뚤어진 문서를 똑바로 세울 거예요.")
@@ -1,11 +1,36 @@
-from konlpy.tag import Okt
-from sklearn.feature_extraction.text import TfidfVectorizer
+import hashlib
+import os
+import time
 from collections import Counter
+from pathlib import Path
+
+from konlpy.tag import Okt
+
+from keyword_bulk import DEFAULT_CHUNK_SIZE, iter_tokenize_nouns
+from keyword_corpus import CorpusModel
+from token_cache import TokenCache
+from user_dict_matcher import UserDictMatcher
 
 # ----------------------------
 # 0) 형태소 분석기 + 사용자 단어 로드
 # ----------------------------
-okt = Okt()
+# Okt 는 JVM 을 띄우므로 처음 쓸 때 만듦 (일괄 처리 워커 프로세스마다 1개)
+_okt = None
+
+
+def get_okt():
+    global _okt
+    if _okt is None:
+        _okt = Okt()
+    return _okt
+
+
+def __getattr__(name):
+    # 예전 코드의 `okt` 접근 호환 (접근 시점에 생성)
+    if name == "okt":
+        return get_okt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # user_dict.txt : 한 줄에 단어 하나씩
 # 예)
@@ -15,12 +40,77 @@ okt = Okt()
 # 이마트
 # 영수증
 # 카페영수증
-try:
-    with open("user_dict.txt", encoding="utf-8") as f:
-        USER_WORDS = [line.strip() for line in f if line.strip()]
-except FileNotFoundError:
-    USER_WORDS = []
-    print("[경고] user_dict.txt 파일이 없습니다. 사용자 단어 없이 진행합니다.")
+USER_DICT_PATH = Path(__file__).parent / "user_dict.txt"  # 실행 위치와 상관없이 이 파일 옆
+USER_DICT_CHECK_INTERVAL = 2.0  # 사전 파일 변경 확인 간격(초) - 문서마다 stat 하지 않도록
+USER_WORDS = []
+USER_MATCHER = UserDictMatcher([])  # 사전 전체를 한 번에 찾는 Aho–Corasick 오토마톤
+USER_DICT_VERSION = "none"  # 사전 내용 해시 (토큰 캐시 키에 포함)
+_user_dict_stat = None
+_user_dict_checked = None  # 마지막 확인 시각 (time.monotonic)
+
+
+def load_user_dict(path=USER_DICT_PATH):
+    global USER_WORDS, USER_MATCHER, USER_DICT_VERSION
+    try:
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+    except FileNotFoundError:
+        USER_WORDS = []
+        USER_MATCHER = UserDictMatcher([])
+        USER_DICT_VERSION = "none"
+        print("[경고] user_dict.txt 파일이 없습니다. 사용자 단어 없이 진행합니다.")
+        return
+    USER_WORDS = [line.strip() for line in content.splitlines() if line.strip()]
+    USER_MATCHER = UserDictMatcher(USER_WORDS)
+    USER_DICT_VERSION = hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+
+
+def refresh_user_dict(path=USER_DICT_PATH, force=False):
+    """
+    user_dict.txt 가 바뀌었으면(수정 시각/크기) 다시 읽기 → 토큰 캐시 키가 바뀌어 자동 무효화
+    확인은 USER_DICT_CHECK_INTERVAL 초에 한 번만 (force=True 면 바로)
+    """
+    global _user_dict_stat, _user_dict_checked
+    now = time.monotonic()
+    if not force and _user_dict_checked is not None and now - _user_dict_checked < USER_DICT_CHECK_INTERVAL:
+        return
+    _user_dict_checked = now
+    try:
+        st = os.stat(path)
+        stat = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stat = None
+    if stat != _user_dict_stat:
+        _user_dict_stat = stat
+        load_user_dict(path)
+        # 예전 사전 버전으로 디스크에 저장된 결과 정리 (메모리는 비움)
+        TOKEN_CACHE.invalidate(keep_namespace=token_cache_namespace())
+
+
+# ----------------------------
+# 0-1) 토크나이즈 결과 캐시 (메모리 LRU + 선택: SQLite 파일)
+# OKT_TOKEN_CACHE_DB 환경변수에 경로를 주면 디스크에도 저장
+# ----------------------------
+OKT_OPTIONS = {"norm": True, "stem": True}
+MIN_NOUN_LEN = 2
+# tokenize_nouns 규칙이 바뀌면 올려서 예전 캐시 결과를 무효화
+TOKENIZER_VERSION = 2
+
+TOKEN_CACHE = TokenCache(path=os.environ.get("OKT_TOKEN_CACHE_DB") or None)
+
+
+def token_cache_namespace():
+    return (
+        f"okt:v{TOKENIZER_VERSION}:norm={OKT_OPTIONS['norm']}:stem={OKT_OPTIONS['stem']}"
+        f":min={MIN_NOUN_LEN}:dict={USER_DICT_VERSION}"
+    )
+
+
+def token_cache_stats():
+    return TOKEN_CACHE.stats()
+
+
+refresh_user_dict(force=True)
 
 
 # ----------------------------
@@ -52,15 +142,21 @@ def create_compound_nouns(pos_result):
 # 2) 토크나이즈(명사 + 사용자 단어 + 복합명사)
 # ----------------------------
 def tokenize_nouns(text: str):
-    pos = okt.pos(text, norm=True, stem=True)
+    """
+    같은 원문 + 같은 사전/옵션이면 캐시에서 바로 (JVM 호출 생략)
+    """
+    refresh_user_dict()
+    return TOKEN_CACHE.get_or_compute(text, token_cache_namespace(), _tokenize_nouns)
+
+
+def _tokenize_nouns(text: str):
+    pos = get_okt().pos(text, **OKT_OPTIONS)
 
     # 명사만 추출 (2글자 이상만)
-    nouns = [word for word, tag in pos if tag == "Noun" and len(word) >= 2]
+    nouns = [word for word, tag in pos if tag == "Noun" and len(word) >= MIN_NOUN_LEN]
 
-    # 사용자 단어 강제 포함 (문장 안에 포함되면 후보로 추가)
-    for w in USER_WORDS:
-        if w in text:
-            nouns.append(w)
+    # 사용자 단어 강제 포함 (등장한 횟수만큼, 겹치면 긴 단어 우선: '카페영수증' > '영수증')
+    nouns.extend(word for _, _, word in USER_MATCHER.find(text))
 
     # 복합명사 생성해서 후보 확장
     compound_nouns = create_compound_nouns(pos)
@@ -88,50 +184,52 @@ def calculate_tf_scores(tokens):
 
 
 # ----------------------------
-# 4) TF-IDF 우선, 안되면 TF로 fallback
+# 4) TF-IDF 코퍼스 모델 (문서 빈도는 디스크에 저장, 문서 단위로 추가/삭제)
 # ----------------------------
-def calculate_scores(doc_texts, tokens_for_single_doc):
+def build_corpus_model(corpus_texts, path=":memory:", workers=None):
     """
-    doc_texts: 여러 문서(코퍼스) 텍스트 리스트
-    tokens_for_single_doc: 지금 키워드 뽑고 싶은 '한 문서'의 토큰들
+    코퍼스 문서들을 토크나이즈해서 CorpusModel 에 넣기
+    path 를 주면 디스크에 저장 → 다음부터는 CorpusModel(path) 로 바로 불러 씀
+    workers 를 주면 토크나이즈를 프로세스 풀로 (큰 코퍼스용)
     """
-    # 문서가 2개 이상이면 TF-IDF 시도
-    if len(doc_texts) >= 2:
-        try:
-            vectorizer = TfidfVectorizer()
-            tfidf = vectorizer.fit_transform(doc_texts)
-
-            # 여기서는 첫 번째 문서(0번)의 점수를 뽑는 예시
-            scores = tfidf.toarray()[0]
-            words = vectorizer.get_feature_names_out()
-            return dict(zip(words, scores))
-        except Exception as e:
-            print("[경고] TF-IDF 계산 실패. TF 방식으로 대체합니다.")
-            print("원인:", e)
-
-    # fallback: TF 방식
-    return calculate_tf_scores(tokens_for_single_doc)
+    model = CorpusModel(path)
+    if workers:
+        tokens = iter_tokenize_nouns(corpus_texts, workers=workers, module_path=__file__)
+    else:
+        tokens = (tokenize_nouns(doc) for doc in corpus_texts)
+    model.add_documents(enumerate(tokens))
+    return model
 
 
 # ----------------------------
 # 5) 키워드 추출 (최종)
 # ----------------------------
-def extract_keywords(text: str, corpus_texts=None, top_k=10):
+def extract_keywords(text: str, corpus_texts=None, top_k=10, model=None):
     """
     text: 키워드 뽑을 대상 문서 원문
-    corpus_texts: (선택) TF-IDF용 코퍼스(여러 문서 원문 리스트)
-                 없으면 TF fallback이 적용될 수 있음
+    model: (선택) CorpusModel - 있으면 토크나이즈 1번 + 희소 벡터 1번으로 TF-IDF 점수
+    corpus_texts: (선택) 모델 대신 코퍼스 원문 리스트 (호출마다 전체를 토크나이즈하므로 느림)
+    둘 다 없거나 코퍼스 문서가 2개 미만이면 TF fallback
     """
     tokens = tokenize_nouns(text)
 
     # TF-IDF는 "여러 문서"가 있어야 의미가 생김
-    if corpus_texts and len(corpus_texts) >= 2:
-        # 코퍼스 문서들도 동일한 토크나이즈 방식으로 전처리해서 넣기
-        doc_texts = [" ".join(tokenize_nouns(doc)) for doc in corpus_texts]
-    else:
-        doc_texts = [" ".join(tokens)]  # 문서 1개짜리 상황
+    if model is None and corpus_texts and len(corpus_texts) >= 2:
+        model = build_corpus_model(corpus_texts)
 
-    scores = calculate_scores(doc_texts, tokens)
+    return rank_keywords(tokens, model, top_k)
+
+
+def rank_keywords(tokens, model=None, top_k=10):
+    """
+    토큰 -> 상위 top_k 키워드 (코퍼스 모델이 있으면 TF-IDF, 없으면 TF)
+    """
+    if model is not None and len(model) >= 2:
+        # 코퍼스 기준으로 "text" 자체의 점수 (상위 top_k 는 희소 행에서 바로)
+        return model.top_keywords(tokens, top_k)
+
+    # fallback: TF 방식
+    scores = calculate_tf_scores(tokens)
 
     # 점수 높은 순으로 정렬
     ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
@@ -142,7 +240,20 @@ def extract_keywords(text: str, corpus_texts=None, top_k=10):
 
 
 # ----------------------------
-# 6) 테스트 실행
+# 6) 대량 키워드 추출 (프로세스 풀, 워커마다 Okt/JVM 1개)
+# ----------------------------
+def iter_extract_keywords(docs, model=None, top_k=10, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    문서 iterable -> 문서마다 [(키워드, 점수)] 를 입력 순서대로 yield
+    - 토크나이즈(Okt)는 워커 프로세스들이 청크 단위로 나눠서, 점수 계산은 여기서
+    - 진행 중인 청크 수가 제한되어 있어서 코퍼스가 커도 메모리가 일정
+    """
+    for tokens in iter_tokenize_nouns(docs, workers=workers, chunk_size=chunk_size, module_path=__file__):
+        yield rank_keywords(tokens, model, top_k)
+
+
+# ----------------------------
+# 7) 테스트 실행
 # ----------------------------
 if __name__ == "__main__":
     # 샘플 문서들 (코퍼스)
@@ -163,3 +274,18 @@ if __name__ == "__main__":
     keywords_b = extract_keywords(docs[0], corpus_texts=None, top_k=10)
     for kw, sc in keywords_b:
         print(f"{kw}\t{sc:.4f}")
+
+    # (C) 디스크에 저장한 코퍼스 모델 사용 (문서 추가는 증분, 새 문서는 다시 학습 없이 점수 계산)
+    print("\n=== [C] 저장된 코퍼스 모델 기반 키워드 (새 문서) ===")
+    corpus = CorpusModel()
+    corpus.add_documents((f"sample-{i}", tokenize_nouns(doc)) for i, doc in enumerate(docs))
+    new_doc = "스타벅스에서 카페라떼와 아메리카노를 샀고 영수증을 받았습니다."
+    keywords_c = extract_keywords(new_doc, model=corpus, top_k=10)
+    for kw, sc in keywords_c:
+        print(f"{kw}\t{sc:.4f}")
+
+    stats = token_cache_stats()
+    print(
+        f"\n[토큰 캐시] 메모리 적중 {stats['memory_hits']} | 디스크 적중 {stats['disk_hits']} | "
+        f"미스 {stats['misses']} | 적중률 {stats['hit_rate']:.0%}"
+    )
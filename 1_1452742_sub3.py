@@ -1,98 +1,188 @@
 import streamlit as st
-from PIL import Image
-import tempfile
-from pathlib import Path
 import pandas as pd
 
-from db import init_db, insert_photo, search_items, list_photos_with_location
-from photo_metadata_test import extract_photo_metadata, is_photo_by_exif
-from photo_object_test import detect_photo_objects
+from db import (
+    init_db,
+    enqueue_job,
+    list_jobs,
+    count_jobs_by_status,
+    search_items,
+    count_search_items,
+    taken_histogram,
+    photo_location_bounds,
+    cluster_photos_in_bbox,
+    list_photos_in_bbox,
+    find_similar_photos_many,
+    get_thumbnails,
+)
+from photo_metadata_test import is_photo_by_exif
+from jobs import JobWorkerPool
 
 
-def generate_photo_keywords(metadata: dict, objects: list):
-    keywords = []
+@st.cache_resource
+def get_job_pool():
+    # rerun 이 일어나도 워커 스레드는 프로세스에 하나의 풀로 유지
+    return JobWorkerPool().start()
 
-    if metadata.get("taken_date"):
-        keywords.append(metadata["taken_date"])
-    if metadata.get("camera_make"):
-        keywords.append(metadata["camera_make"])
-    if metadata.get("camera_model"):
-        keywords.append(metadata["camera_model"])
 
-    if metadata.get("gps_lat") is not None and metadata.get("gps_lon") is not None:
-        keywords.append(f"GPS:{metadata['gps_lat']:.6f},{metadata['gps_lon']:.6f}")
+# 작업 현황 자동 새로고침 주기(초) / 표시 개수
+JOB_REFRESH_SECONDS = 2
+JOB_LIST_LIMIT = 50
+# 업로드 미리보기 최대 장 수 / 열 수
+UPLOAD_PREVIEW_LIMIT = 6
+UPLOAD_PREVIEW_COLUMNS = 3
 
-    keywords.extend(objects)
-    keywords = list(dict.fromkeys([str(k).strip() for k in keywords if k]))
-    return keywords
+# 검색 탭 한 페이지 결과 수 / 썸네일 표시 폭(px)
+SEARCH_PAGE_SIZE = 20
+THUMBNAIL_WIDTH = 160
+
+# 지도 탭 목록에 보여줄 최대 행 수 / 썸네일 한 페이지 개수, 열 수
+MAP_LIST_LIMIT = 200
+MAP_THUMB_PAGE_SIZE = 24
+MAP_THUMB_COLUMNS = 6
 
 
 st.set_page_config(page_title="AI 아카이브 - 실습과제3", layout="wide")
 st.title("실습과제3: 사진 구분 및 메타데이터 검색")
 
 init_db()
+job_pool = get_job_pool()
 
 tab1, tab2, tab3 = st.tabs(["업로드/저장", "검색", "지도(위치 있는 사진)"])
 
 with tab1:
-    st.subheader("1) 사진 업로드 → EXIF/객체 탐지 → 키워드 생성 → DB 저장")
+    st.subheader("1) 사진 업로드 → 대기열 → (백그라운드) EXIF/객체 탐지 → 키워드 생성 → DB 저장")
 
-    uploaded = st.file_uploader("사진 파일 업로드 (jpg/png)", type=["jpg", "jpeg", "png"])
-    if uploaded is None:
-        st.info("사진을 업로드하면 분석 결과가 나오고 저장할 수 있어요.")
-        st.stop()
+    multi = st.toggle("여러 장 한 번에 올리기")
+    uploaded = st.file_uploader(
+        "사진 파일 업로드 (jpg/png)",
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=multi,
+    )
+    files = uploaded if multi else ([uploaded] if uploaded is not None else [])
+
+    if files:
+        # 올린 파일 bytes 를 그대로 브라우저에 보냄 (여기서 디코드하지 않음, 분석은 워커가)
+        cols = st.columns(UPLOAD_PREVIEW_COLUMNS)
+        for i, f in enumerate(files[:UPLOAD_PREVIEW_LIMIT]):
+            cols[i % UPLOAD_PREVIEW_COLUMNS].image(f.getvalue(), caption=f.name, use_container_width=True)
+        if len(files) > UPLOAD_PREVIEW_LIMIT:
+            st.caption(f"외 {len(files) - UPLOAD_PREVIEW_LIMIT}장")
+
+    if not files:
+        st.info("사진을 올리고 [분석 후 DB에 저장]을 누르면 백그라운드에서 분석·저장돼요. 기다리지 않고 다른 탭을 써도 돼요.")
+    # 버튼을 눌러야만 대기열에 들어감 (분석이 끝나면 따로 확인 없이 바로 DB 에 저장)
+    elif st.button(f"분석 후 DB에 저장 ({len(files)}장)", type="primary"):
+        for f in files:
+            enqueue_job(f.name, f.getbuffer())
+        job_pool.notify()
+        st.success(f"{len(files)}장을 대기열에 넣었어요. 아래에서 진행 상황을 볼 수 있어요.")
 
-    suffix = Path(uploaded.name).suffix
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(uploaded.getbuffer())
-        tmp_path = tmp.name
-
-    st.image(Image.open(uploaded), caption="업로드한 이미지", use_container_width=True)
-
-    meta = extract_photo_metadata(tmp_path)
-    objs = detect_photo_objects(tmp_path, conf=0.25)
-    keywords = generate_photo_keywords(meta, objs)
-
-    col1, col2 = st.columns(2)
-    with col1:
-        st.write("### EXIF 메타데이터")
-        st.json(meta)
-
-    with col2:
-        st.write("### 객체 탐지 결과")
-        st.write(objs if objs else "탐지된 객체가 없어요(사진에 따라 정상).")
-
-    st.write("### 최종 키워드")
-    st.write(keywords)
-
-    is_photo = is_photo_by_exif(meta)
-    st.write("### 사진 판별(EXIF 기준)")
-    st.write("✅ 사진일 가능성 높음" if is_photo else "⚠️ EXIF가 부족해 애매함 (그래도 저장은 가능)")
-
-    if st.button("DB에 저장"):
-        insert_photo(
-            file_name=uploaded.name,
-            taken_date=meta.get("taken_date"),
-            camera_make=meta.get("camera_make"),
-            camera_model=meta.get("camera_model"),
-            gps_lat=meta.get("gps_lat"),
-            gps_lon=meta.get("gps_lon"),
-            objects=objs,
-            keywords=keywords,
+    @st.fragment(run_every=JOB_REFRESH_SECONDS)
+    def job_status_view():
+        st.write("### 작업 현황")
+        counts = count_jobs_by_status()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("대기", counts.get("queued", 0))
+        c2.metric("처리 중", counts.get("running", 0))
+        c3.metric("완료", counts.get("done", 0))
+        c4.metric("실패", counts.get("failed", 0))
+
+        jobs = list_jobs(limit=JOB_LIST_LIMIT)
+        if not jobs:
+            return
+
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "id": j["id"],
+                    "file_name": j["file_name"],
+                    "status": j["status"],
+                    "progress": j["progress"],
+                    "item_id": j["item_id"],
+                    "error": j["error"],
+                    "updated_at": j["updated_at"],
+                }
+                for j in jobs
+            ]),
+            column_config={"progress": st.column_config.ProgressColumn("progress", min_value=0, max_value=1)},
+            use_container_width=True,
+            hide_index=True,
         )
-        st.success("저장 완료! 이제 [검색] 탭에서 찾아볼 수 있어요.")
+
+        done = [j for j in jobs if j["status"] == "done"]
+        if not done:
+            return
+        picked = st.selectbox(
+            "결과 보기",
+            done,
+            format_func=lambda j: f"#{j['id']} {j['file_name']} (item #{j['item_id']})",
+        )
+        meta = picked["result"]["metadata"]
+        objs = picked["result"]["objects"]
+
+        thumb = get_thumbnails([picked["item_id"]]).get(picked["item_id"])
+        if thumb is not None:
+            st.image(thumb, caption="저장된 이미지")
+        if picked["result"].get("existing"):
+            st.info(f"같은 내용의 사진이 이미 저장돼 있어서 새로 저장하지 않았어요 (item #{picked['item_id']}).")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("### EXIF 메타데이터")
+            st.json(meta)
+
+        with col2:
+            st.write("### 객체 탐지 결과")
+            st.write(objs if objs else "탐지된 객체가 없어요(사진에 따라 정상).")
+
+        st.write("### 최종 키워드")
+        st.write(picked["result"]["keywords"])
+
+        is_photo = is_photo_by_exif(meta)
+        st.write("### 사진 판별(EXIF 기준)")
+        st.write("✅ 사진일 가능성 높음" if is_photo else "⚠️ EXIF가 부족해 애매함 (그래도 저장은 가능)")
+
+    job_status_view()
 
 with tab2:
     st.subheader("2) 사진 메타데이터/키워드 기반 검색")
     q = st.text_input("검색어 입력 (예: person / iPhone / 2026 / GPS / car)")
+
+    # 촬영일시 범위 필터 (DB 인덱스 범위 검색)
+    use_date = st.checkbox("촬영일 범위로 필터")
+    taken_from = taken_to = None
+    if use_date:
+        date_range = st.date_input("촬영일 범위", value=())
+        if len(date_range) == 2:
+            taken_from, taken_to = date_range
+            hist = taken_histogram("day", taken_from, taken_to)
+            if hist:
+                st.bar_chart(pd.DataFrame(hist).set_index("period"))
+
     if st.button("검색"):
-        results = search_items(q)
-        if not results:
+        # 검색 조건과 페이지 커서는 rerun 사이에 유지
+        st.session_state["search"] = {"query": q, "taken_from": taken_from, "taken_to": taken_to}
+        st.session_state["search_pages"] = [(None, None)]  # 페이지별 시작 커서 (after_id, after_score)
+
+    search = st.session_state.get("search")
+    if search:
+        total = count_search_items(**search)
+        if total == 0:
             st.warning("검색 결과가 없어요.")
         else:
-            st.write(f"총 {len(results)}개")
+            pages = st.session_state["search_pages"]
+            after_id, after_score = pages[-1]
+            results = search_items(**search, after_id=after_id, after_score=after_score, limit=SEARCH_PAGE_SIZE)
+
+            st.write(f"총 {total}개 (페이지 {len(pages)} / {-(-total // SEARCH_PAGE_SIZE)})")
+            # 썸네일은 지금 페이지 것만 한 번에 가져옴
+            thumbs = get_thumbnails(r["id"] for r in results)
+            similar_by_id = find_similar_photos_many((r["id"] for r in results), limit=5)
             for r in results:
                 st.markdown(f"**#{r['id']} | {r['file_name']}**")
+                if r["id"] in thumbs:
+                    st.image(thumbs[r["id"]], width=THUMBNAIL_WIDTH)
                 st.write({
                     "type": r["item_type"],
                     "taken_date": r["taken_date"],
@@ -102,27 +192,56 @@ with tab2:
                     "keywords": r["keywords"],
                     "created_at": r["created_at"],
                 })
+                similar = similar_by_id.get(r["id"])
+                if similar:
+                    with st.expander(f"비슷한 사진 {len(similar)}장"):
+                        for sim in similar:
+                            st.write(f"#{sim['id']} | {sim['file_name']} (차이 {sim['distance']}비트)")
                 st.divider()
 
+            prev_col, next_col = st.columns(2)
+            if prev_col.button("이전 페이지", disabled=len(pages) == 1):
+                pages.pop()
+                st.rerun()
+            has_next = len(results) == SEARCH_PAGE_SIZE and len(pages) * SEARCH_PAGE_SIZE < total
+            if next_col.button("다음 페이지", disabled=not has_next):
+                pages.append((results[-1]["id"], results[-1]["score"]))
+                st.rerun()
+
 with tab3:
     st.subheader("3) GPS가 있는 사진만 지도에 표시 (있는 경우에만)")
 
-    photos = list_photos_with_location()
-    if not photos:
+    bounds = photo_location_bounds()
+    if bounds is None:
         st.info("GPS가 저장된 사진이 아직 없어요. (카메라 앱에서 위치 저장을 켜고 찍은 사진을 올리면 나와요.)")
         st.stop()
 
-    # 지도 표시용 데이터프레임
-    df_map = pd.DataFrame([
-        {"lat": p["gps_lat"], "lon": p["gps_lon"]}
-        for p in photos
-    ])
+    # 지도 화면 범위 (기본값: 전체 사진 범위)
+    c1, c2, c3, c4 = st.columns(4)
+    min_lat = c1.number_input("최소 위도", value=float(bounds["min_lat"]), format="%.6f")
+    max_lat = c2.number_input("최대 위도", value=float(bounds["max_lat"]), format="%.6f")
+    min_lon = c3.number_input("최소 경도", value=float(bounds["min_lon"]), format="%.6f")
+    max_lon = c4.number_input("최대 경도", value=float(bounds["max_lon"]), format="%.6f")
+    max_points = st.slider("지도에 표시할 최대 점 개수", min_value=50, max_value=2000, value=400, step=50)
+
+    # DB에서 격자 단위로 묶은 점만 가져옴 (사진 수와 상관없이 최대 max_points 개)
+    clusters = cluster_photos_in_bbox(min_lat, min_lon, max_lat, max_lon, max_points=max_points)
+    if not clusters:
+        st.info("이 범위에는 위치가 있는 사진이 없어요.")
+        st.stop()
+
+    df_map = pd.DataFrame(clusters)
+    # 점 크기: 사진 수에 비례 (격자 한 칸 크기를 넘지 않게, 단위: m)
+    cell_m = max(max_lat - min_lat, 1e-6) / max(1, int(max_points ** 0.5)) * 111_000
+    df_map["size"] = (df_map["count"] / df_map["count"].max()) ** 0.5 * cell_m / 2
 
     st.write("### 지도")
-    st.map(df_map)
+    st.map(df_map, latitude="lat", longitude="lon", size="size")
+    st.caption(f"사진 {int(df_map['count'].sum())}장을 점 {len(df_map)}개로 묶어서 표시")
 
     # 보기 좋게 표 + 상세정보
-    st.write("### GPS 사진 목록")
+    st.write(f"### GPS 사진 목록 (최근 {MAP_LIST_LIMIT}개)")
+    photos = list_photos_in_bbox(min_lat, min_lon, max_lat, max_lon, limit=MAP_LIST_LIMIT)
     df_list = pd.DataFrame([
         {
             "id": p["id"],
@@ -136,4 +255,18 @@ with tab3:
     ])
     st.dataframe(df_list, use_container_width=True)
 
+    if photos:
+        # 목록 중 한 페이지 분량만 썸네일로 표시
+        n_pages = -(-len(photos) // MAP_THUMB_PAGE_SIZE)
+        page = st.number_input("썸네일 페이지", min_value=1, max_value=n_pages, value=1, step=1)
+        page_photos = photos[(page - 1) * MAP_THUMB_PAGE_SIZE: page * MAP_THUMB_PAGE_SIZE]
+        thumbs = get_thumbnails(p["id"] for p in page_photos)
+        cols = st.columns(MAP_THUMB_COLUMNS)
+        for i, p in enumerate(page_photos):
+            with cols[i % MAP_THUMB_COLUMNS]:
+                if p["id"] in thumbs:
+                    st.image(thumbs[p["id"]], caption=f"#{p['id']}", use_container_width=True)
+                else:
+                    st.caption(f"#{p['id']} (썸네일 없음)")
+
     st.caption("※ GPS는 사진에 위치 정보(EXIF)가 저장된 경우에만 표시됩니다.")
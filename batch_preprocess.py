@@ -0,0 +1,281 @@
+"""
+문서 이미지 일괄 전처리 (헤드리스, OCR 전 밤샘 작업용)
+
+    python batch_preprocess.py <입력 폴더> <출력 폴더> [--preset default] [--format png] [--workers 8]
+
+- 파일 단위로 프로세스 풀에 나눠서 처리 (워커마다 cv2 스레드 수를 제한해서 코어를 나눠 씀)
+- 출력 폴더의 .preprocess_manifest.json 에 (입력 SHA-256, 옵션) 을 기록해 두고,
+  같은 입력/옵션으로 이미 만든 결과는 건너뜀 → 중단 후 다시 실행하면 이어서 진행
+- 파일별 단계 시간은 CSV 리포트로 저장 (기본: 출력 폴더/preprocess_report.csv)
+- 아주 큰 스캔(TILED_MIN_PIXELS 이상)은 PNG 출력일 때 띠 단위로 처리 (8비트 gray PNG 로 저장)
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from doc_preprocess import DEFAULT_PARAMS, STAGES, TILED_MIN_PIXELS, preprocess_array, preprocess_tiled
+
+SCAN_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+# 옵션 묶음 (--preset 에 이름 또는 JSON 파일 경로)
+PRESETS = {
+    "default": dict(DEFAULT_PARAMS),
+    # 깨끗한 스캔: 노이즈 제거/대비는 생략하고 이진화 + 기울기만
+    "clean-scan": {**DEFAULT_PARAMS, "use_denoise": False, "use_contrast": False},
+    # 잡음 많은 사진/팩스: 커널 크게, 대비 강하게
+    "noisy": {**DEFAULT_PARAMS, "denoise_strength": 7, "contrast_alpha": 1.8},
+    # 기울기 보정 없이 (이미 똑바른 문서)
+    "no-deskew": {**DEFAULT_PARAMS, "use_deskew": False},
+}
+
+MANIFEST_NAME = ".preprocess_manifest.json"
+MANIFEST_SAVE_EVERY = 100  # 이 개수마다 manifest 저장 (중단 대비)
+
+PNG_COMPRESS_LEVEL = 6
+
+
+def load_preset(name_or_path: str) -> dict:
+    if name_or_path in PRESETS:
+        return dict(PRESETS[name_or_path])
+    path = Path(name_or_path)
+    if path.is_file():
+        return {**DEFAULT_PARAMS, **json.loads(path.read_text(encoding="utf-8"))}
+    raise ValueError(f"알 수 없는 preset: {name_or_path} (가능: {', '.join(PRESETS)} 또는 JSON 파일)")
+
+
+def params_digest(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def iter_scan_files(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(SCAN_EXTENSIONS):
+                yield Path(dirpath) / name
+
+
+# ----------------------------
+# 워커 프로세스
+# ----------------------------
+def _init_worker(cv2_threads: int):
+    import cv2
+
+    # 프로세스 N개 x cv2 스레드 M개가 코어 수를 넘지 않게
+    cv2.setNumThreads(cv2_threads)
+
+
+def _save_image(gray, dst: Path, fmt: str):
+    """
+    gray 배열 저장 (0/255 만 있으면 1비트로: PNG 는 팔레트, TIFF 는 CCITT G4)
+    같은 폴더에 임시 파일로 쓴 뒤 교체 → 중간에 끊겨도 반쯤 쓴 파일이 남지 않음
+    """
+    import numpy as np
+    from PIL import Image
+
+    binary = not np.any((gray != 0) & (gray != 255))
+    img = Image.fromarray(gray)
+    if binary:
+        img = img.convert("1")
+
+    buf = io.BytesIO()
+    if fmt == "tiff":
+        img.save(buf, format="TIFF", compression="group4" if binary else "tiff_adobe_deflate")
+    else:
+        img.save(buf, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+
+    tmp = dst.with_name(dst.name + ".tmp")
+    tmp.write_bytes(buf.getvalue())
+    os.replace(tmp, dst)
+    return len(buf.getvalue())
+
+
+def _process_file(src: str, dst: str, params: dict, fmt: str, known_hash: str = None) -> dict:
+    """
+    파일 1개 전처리 -> 리포트 행 dict
+    known_hash 와 입력 해시가 같고 출력이 있으면 건너뜀 ("skipped")
+    """
+    from PIL import Image
+    import numpy as np
+
+    row = {"file": src, "status": "done", "mode": "full", "error": ""}
+    t_start = time.perf_counter()
+    try:
+        data = Path(src).read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        row["input_sha256"] = digest
+        row["in_bytes"] = len(data)
+        if known_hash == digest and Path(dst).exists():
+            row["status"] = "skipped"
+            return row
+
+        with Image.open(io.BytesIO(data)) as pil:
+            width, height = pil.size
+        if fmt == "png" and width * height >= TILED_MIN_PIXELS:
+            # 원본 bytes 는 해시에만 쓰고 버림, 처리는 파일에서 띠 단위로
+            del data
+            row["mode"] = "tiled"
+            tmp = Path(dst).with_name(Path(dst).name + ".tmp")
+            Path(dst).parent.mkdir(parents=True, exist_ok=True)
+            result = preprocess_tiled(src, tmp, **params)
+            os.replace(tmp, dst)
+            for t in result["timings"]:
+                row[f"{t['stage']}_ms"] = t["ms"]
+            row["read_ms"] = row.pop("load_ms")
+            if "deskew_angle_ms" in row:
+                row["deskew_ms"] = row.pop("deskew_angle_ms") + row.pop("rotate_ms", 0.0)
+            row["out_bytes"] = Path(dst).stat().st_size
+            return row
+
+        t0 = time.perf_counter()
+        with Image.open(io.BytesIO(data)) as pil:
+            rgb = np.array(pil.convert("RGB"))
+        row["read_ms"] = (time.perf_counter() - t0) * 1000
+
+        gray, timings = preprocess_array(rgb, **params)
+        for t in timings:
+            row[f"{t['stage']}_ms"] = t["ms"]
+
+        t0 = time.perf_counter()
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        row["out_bytes"] = _save_image(gray, Path(dst), fmt)
+        row["write_ms"] = (time.perf_counter() - t0) * 1000
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        row["total_ms"] = (time.perf_counter() - t_start) * 1000
+    return row
+
+
+# ----------------------------
+# 메인 프로세스
+# ----------------------------
+REPORT_COLUMNS = (
+    ["file", "status", "in_bytes", "out_bytes", "read_ms"]
+    + [f"{stage[0]}_ms" for stage in STAGES]
+    + ["local_ms", "write_ms", "total_ms", "mode", "input_sha256", "error"]
+)
+
+
+def _load_manifest(path: Path) -> dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {}
+
+
+def _save_manifest(path: Path, manifest: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def run_batch(
+    input_dir,
+    output_dir,
+    params: dict,
+    fmt: str = "png",
+    workers: int = None,
+    cv2_threads: int = 1,
+    report_path=None,
+):
+    """
+    input_dir 아래 스캔 이미지를 전부 전처리해서 output_dir 에 같은 상대 경로로 저장
+    반환: {"done", "skipped", "error"} 개수
+    """
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    report_path = Path(report_path) if report_path else output_dir / "preprocess_report.csv"
+
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+    p_digest = params_digest(params)
+    suffix = ".tif" if fmt == "tiff" else ".png"
+
+    counts = {"done": 0, "skipped": 0, "error": 0}
+    started = time.perf_counter()
+    since_save = 0
+
+    with open(report_path, "w", newline="", encoding="utf-8") as report_file, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(cv2_threads,)
+    ) as pool:
+        writer = csv.DictWriter(report_file, fieldnames=REPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+
+        files = iter_scan_files(input_dir)
+        pending = {}
+        exhausted = False
+        while True:
+            # 파일 목록이 수만 개여도 future 는 워커 수의 몇 배만 유지
+            while not exhausted and len(pending) < workers * 4:
+                src = next(files, None)
+                if src is None:
+                    exhausted = True
+                    break
+                dst = (output_dir / src.relative_to(input_dir)).with_suffix(suffix)
+                rel = dst.relative_to(output_dir).as_posix()  # manifest 키: 출력 파일 기준
+                entry = manifest.get(rel)
+                known = entry["input_sha256"] if entry and entry.get("params") == p_digest else None
+                fut = pool.submit(_process_file, str(src), str(dst), params, fmt, known)
+                pending[fut] = rel
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                rel = pending.pop(fut)
+                row = fut.result()
+                counts[row["status"]] += 1
+                writer.writerow(row)
+                if row["status"] == "done":
+                    manifest[rel] = {"input_sha256": row["input_sha256"], "params": p_digest}
+                    since_save += 1
+                elif row["status"] == "error":
+                    print(f"[오류] {row['file']}: {row['error']}")
+
+            if since_save >= MANIFEST_SAVE_EVERY:
+                _save_manifest(manifest_path, manifest)
+                report_file.flush()
+                since_save = 0
+                elapsed = time.perf_counter() - started
+                print(f"[진행] 완료 {counts['done']} | 건너뜀 {counts['skipped']} | 오류 {counts['error']} | "
+                      f"{counts['done'] / max(elapsed, 1e-9):.1f} files/s")
+
+    _save_manifest(manifest_path, manifest)
+    elapsed = time.perf_counter() - started
+    print(f"\n[완료] 완료 {counts['done']} | 건너뜀 {counts['skipped']} | 오류 {counts['error']}")
+    print(f"소요 {elapsed:.1f}초, {counts['done'] / max(elapsed, 1e-9):.2f} files/s, 리포트: {report_path}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="폴더 안의 문서 스캔을 일괄 전처리 (OCR 전 정리)")
+    parser.add_argument("input_dir", help="스캔 이미지 폴더 (하위 폴더 포함)")
+    parser.add_argument("output_dir", help="결과 저장 폴더 (같은 상대 경로로 저장)")
+    parser.add_argument("--preset", default="default", help=f"옵션 묶음: {', '.join(PRESETS)} 또는 JSON 파일 경로")
+    parser.add_argument("--format", choices=("png", "tiff"), default="png", help="출력 형식 (압축 PNG / TIFF)")
+    parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument("--cv2-threads", type=int, default=1, help="워커 하나당 OpenCV 스레드 수")
+    parser.add_argument("--report", default=None, help="파일별 시간 리포트 CSV 경로")
+    args = parser.parse_args()
+
+    run_batch(
+        args.input_dir,
+        args.output_dir,
+        load_preset(args.preset),
+        fmt=args.format,
+        workers=args.workers,
+        cv2_threads=args.cv2_threads,
+        report_path=args.report,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,665 @@
+import atexit
+import json
+import re
 import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import combinations
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Tuple, Union
 
 DB_PATH = Path(__file__).parent / "archive.db"
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+# 전문 검색(FTS5) 대상 컬럼
+FTS_COLUMNS = ["file_name", "taken_date", "camera_make", "camera_model", "objects", "keywords"]
+
+ITEM_COLUMNS = ["id","file_name","item_type","taken_date","camera_make","camera_model","gps_lat","gps_lon","objects","keywords","created_at"]
+
+# 연결 설정
+# - WAL: 쓰기(대량 저장) 중에도 읽기(검색)가 막히지 않음
+# - synchronous=NORMAL: WAL 에서는 커밋마다 fsync 하지 않아도 안전
+# - cache_size 는 음수면 KiB 단위
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_active: Dict[threading.Thread, sqlite3.Connection] = {}   # 스레드별로 빌려준 연결
+_idle: List[sqlite3.Connection] = []                      # 반납된 연결 (같은 DB_PATH)
+_pool_path: Optional[str] = None
+_pool_generation = 0
+
+def _open_conn(path: str) -> sqlite3.Connection:
+    # 스레드가 끝나면 다른 스레드가 재사용하므로 check_same_thread 는 끔
+    # (한 시점에 한 스레드만 쓰는 것은 풀이 보장)
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
+    for key, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {key}={value}")
+    return conn
+
+def _reclaim_dead_threads():
+    """
+    종료된 스레드가 들고 있던 연결을 idle 풀로 회수 (_pool_lock 안에서 호출)
+    Streamlit 은 rerun 마다 새 스레드에서 스크립트를 실행하므로
+    연결을 닫지 않고 다음 스레드에 넘겨준다.
+    """
+    for t in [t for t in _active if not t.is_alive()]:
+        conn = _active.pop(t)
+        if conn.in_transaction:
+            conn.rollback()
+        _idle.append(conn)
+
+def get_conn() -> sqlite3.Connection:
+    """
+    현재 스레드 전용의 오래 유지되는 연결 반환.
+    `with get_conn() as conn:` 블록은 커밋/롤백만 하고 연결은 닫지 않는다.
+    """
+    global _pool_path
+
+    path = str(DB_PATH)
+    conn = getattr(_local, "conn", None)
+    if (
+        conn is not None
+        and _local.path == path
+        and _local.generation == _pool_generation
+    ):
+        return conn
+
+    with _pool_lock:
+        if _pool_path != path:
+            # DB_PATH 가 바뀌면 이전 DB 의 연결은 모두 정리
+            _close_all_locked()
+            _pool_path = path
+
+        _reclaim_dead_threads()
+        me = threading.current_thread()
+        conn = _active.get(me)
+        if conn is None:
+            conn = _idle.pop() if _idle else _open_conn(path)
+            _active[me] = conn
+
+    _local.conn = conn
+    _local.path = path
+    _local.generation = _pool_generation
+    return conn
+
+def close_conn():
+    """
+    현재 스레드의 연결을 반납 (작업 스레드 종료 시 호출)
+    """
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is None:
+        return
+    with _pool_lock:
+        if _active.get(threading.current_thread()) is conn:
+            del _active[threading.current_thread()]
+            if conn.in_transaction:
+                conn.rollback()
+            _idle.append(conn)
+
+def _close_all_locked():
+    global _pool_generation
+    for conn in list(_active.values()) + _idle:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _active.clear()
+    _idle.clear()
+    _pool_generation += 1
+
+def shutdown_db():
+    """
+    풀의 모든 연결을 닫음 (프로세스 종료 시 자동 호출)
+    """
+    with _pool_lock:
+        _close_all_locked()
+
+atexit.register(shutdown_db)
+
+def _table_exists(conn, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+def _init_fts(conn):
+    """
+    items 와 동기화되는 FTS5 인덱스(items_fts) 생성.
+    - external content 테이블 + 트리거로 INSERT/UPDATE/DELETE 반영
+    - 처음 만들어질 때 기존 행을 한 번에 백필(rebuild)
+    FTS5 가 없는 SQLite 빌드에서는 아무것도 하지 않음 (LIKE 검색으로 대체)
+    """
+    if _table_exists(conn, "items_fts"):
+        return
+
+    cols = ", ".join(FTS_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_cols = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    try:
+        conn.execute(f"""
+        CREATE VIRTUAL TABLE items_fts USING fts5(
+            {cols},
+            content='items',
+            content_rowid='id'
+        )
+        """)
+    except sqlite3.OperationalError:
+        # no such module: fts5
+        return
+
+    conn.executescript(f"""
+    CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, {cols}) VALUES (new.id, {new_cols});
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF {cols} ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+        INSERT INTO items_fts(rowid, {cols}) VALUES (new.id, {new_cols});
+    END;
+    """)
+    conn.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+def _init_label_tables(conn):
+    """
+    객체/키워드 정규화 테이블 생성.
+    - item_objects: 사진별 객체 라벨, 등장 횟수, 최고 신뢰도
+    - item_keywords: 사진별 키워드
+    (label, item_id) 순 인덱스로 정확 일치 검색/집계를 인덱스만으로 처리.
+    처음 만들어질 때 items 의 콤마 구분 컬럼에서 백필.
+    """
+    created = not _table_exists(conn, "item_objects")
+
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS item_objects (
+        item_id INTEGER NOT NULL,
+        label TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 1,
+        max_conf REAL,
+        PRIMARY KEY (item_id, label)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_item_objects_label ON item_objects(label, item_id, count);
+
+    CREATE TABLE IF NOT EXISTS item_keywords (
+        item_id INTEGER NOT NULL,
+        keyword TEXT NOT NULL,
+        PRIMARY KEY (item_id, keyword)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_item_keywords_keyword ON item_keywords(keyword, item_id);
+
+    CREATE TRIGGER IF NOT EXISTS items_labels_ad AFTER DELETE ON items BEGIN
+        DELETE FROM item_objects WHERE item_id = old.id;
+        DELETE FROM item_keywords WHERE item_id = old.id;
+    END;
+    """)
+
+    if created:
+        rows = conn.execute("SELECT id, objects, keywords FROM items").fetchall()
+        object_rows, keyword_rows = [], []
+        for item_id, objects, keywords in rows:
+            o_rows, k_rows = _item_label_rows(
+                item_id,
+                [o for o in (objects or "").split(",") if o],
+                None,
+                _split_keywords(keywords),
+            )
+            object_rows.extend(o_rows)
+            keyword_rows.extend(k_rows)
+        _insert_item_labels(conn, object_rows, keyword_rows)
+    else:
+        _repair_gps_keywords(conn)
+
+# generate_photo_keywords 의 GPS 키워드 "GPS:위도,경도" 는 안에 콤마가 있음
+_GPS_KEYWORD_RE = re.compile(r"GPS:[-+]?\d+(?:\.\d+)?,[-+]?\d+(?:\.\d+)?")
+
+def _split_keywords(text: Optional[str]) -> List[str]:
+    """
+    items.keywords (콤마 구분) -> 키워드 리스트, "GPS:위도,경도" 는 한 키워드로
+    """
+    parts = [k for k in (text or "").split(",") if k]
+    keywords = []
+    i = 0
+    while i < len(parts):
+        if i + 1 < len(parts) and _GPS_KEYWORD_RE.fullmatch(f"{parts[i]},{parts[i + 1]}"):
+            keywords.append(f"{parts[i]},{parts[i + 1]}")
+            i += 2
+        else:
+            keywords.append(parts[i])
+            i += 1
+    return keywords
+
+def _repair_gps_keywords(conn):
+    """
+    예전 백필이 "GPS:위도,경도" 를 "GPS:위도" / "경도" 두 키워드로 나눠 넣은 사진들의 키워드 다시 생성
+    (keyword 인덱스 범위 조회라 고칠 게 없으면 거의 비용 없음)
+    """
+    ids = [r[0] for r in conn.execute(
+        "SELECT DISTINCT item_id FROM item_keywords "
+        "WHERE keyword >= 'GPS:' AND keyword < 'GPS;' AND instr(keyword, ',') = 0"
+    )]
+    if not ids:
+        return
+    marks = ", ".join("?" for _ in ids)
+    rows = conn.execute(f"SELECT id, keywords FROM items WHERE id IN ({marks})", ids).fetchall()
+    conn.execute(f"DELETE FROM item_keywords WHERE item_id IN ({marks})", ids)
+    keyword_rows = []
+    for item_id, keywords in rows:
+        keyword_rows.extend(_item_label_rows(item_id, [], None, _split_keywords(keywords))[1])
+    _insert_item_labels(conn, [], keyword_rows)
+
+def _item_label_rows(
+    item_id: int,
+    objects: List[str],
+    object_confs: Optional[List[float]],
+    keywords: List[str],
+):
+    """
+    한 사진의 item_objects / item_keywords 행 생성
+    object_confs 가 있으면 objects 와 같은 순서의 신뢰도 리스트
+    """
+    stats: Dict[str, List[Any]] = {}
+    for i, label in enumerate(objects):
+        label = label.strip()
+        if not label:
+            continue
+        conf = object_confs[i] if object_confs is not None else None
+        if label not in stats:
+            stats[label] = [0, None]
+        stats[label][0] += 1
+        if conf is not None and (stats[label][1] is None or conf > stats[label][1]):
+            stats[label][1] = conf
+
+    object_rows = [(item_id, label, cnt, mc) for label, (cnt, mc) in stats.items()]
+    keyword_rows = [(item_id, k.strip()) for k in keywords if k.strip()]
+    return object_rows, keyword_rows
+
+def _insert_item_labels(conn, object_rows, keyword_rows):
+    conn.executemany(
+        "INSERT OR REPLACE INTO item_objects (item_id, label, count, max_conf) VALUES (?, ?, ?, ?)",
+        object_rows,
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO item_keywords (item_id, keyword) VALUES (?, ?)",
+        keyword_rows,
+    )
+
+
+def _init_geo_index(conn):
+    """
+    GPS 좌표용 R*Tree 인덱스(items_geo) 생성.
+    - 위치가 있는 사진만 들어가며 트리거로 INSERT/UPDATE/DELETE 반영
+    - 처음 만들어질 때 기존 행 백필
+    R*Tree 모듈이 없으면 (gps_lat, gps_lon) 일반 인덱스로 대체
+    """
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_items_gps ON items(gps_lat, gps_lon)"
+    )
+    if _table_exists(conn, "items_geo"):
+        return
+
+    try:
+        conn.execute("""
+        CREATE VIRTUAL TABLE items_geo USING rtree(
+            id,
+            min_lat, max_lat,
+            min_lon, max_lon
+        )
+        """)
+    except sqlite3.OperationalError:
+        # no such module: rtree
+        return
+
+    conn.executescript("""
+    CREATE TRIGGER IF NOT EXISTS items_geo_ai AFTER INSERT ON items
+    WHEN new.item_type = 'photo' AND new.gps_lat IS NOT NULL AND new.gps_lon IS NOT NULL
+    BEGIN
+        INSERT INTO items_geo VALUES (new.id, new.gps_lat, new.gps_lat, new.gps_lon, new.gps_lon);
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_geo_ad AFTER DELETE ON items BEGIN
+        DELETE FROM items_geo WHERE id = old.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_geo_au AFTER UPDATE OF item_type, gps_lat, gps_lon ON items BEGIN
+        DELETE FROM items_geo WHERE id = old.id;
+        INSERT INTO items_geo
+        SELECT new.id, new.gps_lat, new.gps_lat, new.gps_lon, new.gps_lon
+        WHERE new.item_type = 'photo' AND new.gps_lat IS NOT NULL AND new.gps_lon IS NOT NULL;
+    END;
+    """)
+    conn.execute("""
+    INSERT INTO items_geo
+    SELECT id, gps_lat, gps_lat, gps_lon, gps_lon
+    FROM items
+    WHERE item_type = 'photo' AND gps_lat IS NOT NULL AND gps_lon IS NOT NULL
+    """)
+
+# EXIF 날짜 형식: "2024:01:15 10:22:01" (+ 선택: ".123" 초 이하, "+09:00" 오프셋)
+_EXIF_DT_RE = re.compile(
+    r"^\s*(\d{4})[:-](\d{2})[:-](\d{2})[ T](\d{2}):(\d{2}):(\d{2})"
+    r"(?:\.(\d+))?\s*(Z|[+-]\d{2}:?\d{2})?\s*$"
+)
+
+def _parse_utc_offset(offset: Optional[str]) -> Optional[int]:
+    """
+    "+09:00" / "-0530" / "Z" -> 분 단위 오프셋 (알 수 없으면 None)
+    """
+    if not offset:
+        return None
+    offset = str(offset).strip()
+    if offset == "Z":
+        return 0
+    m = re.match(r"^([+-])(\d{2}):?(\d{2})$", offset)
+    if not m:
+        return None
+    minutes = int(m.group(2)) * 60 + int(m.group(3))
+    return -minutes if m.group(1) == "-" else minutes
+
+def parse_exif_datetime(
+    value: Optional[str],
+    subsec: Optional[str] = None,
+    offset: Optional[str] = None,
+) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    EXIF 촬영일시 문자열 -> (epoch 밀리초, UTC 오프셋(분) 또는 None)
+    - subsec: SubSecTimeOriginal ("123" -> 0.123초)
+    - offset: OffsetTimeOriginal ("+09:00")
+    오프셋을 모르면 촬영지 현지 시각을 그대로 UTC 로 간주한다.
+    "0000:00:00 00:00:00" 같은 깨진 값은 None
+    """
+    if not value:
+        return None
+    m = _EXIF_DT_RE.match(str(value))
+    if not m:
+        return None
+
+    try:
+        dt = datetime(*(int(g) for g in m.groups()[:6]), tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+    digits = m.group(7) or (str(subsec).strip() if subsec else "")
+    ms = 0
+    if digits.isdigit():
+        ms = min(999, int(round(float("0." + digits) * 1000)))
+
+    tz = _parse_utc_offset(m.group(8) or offset)
+    ts = int(dt.timestamp()) * 1000 + ms
+    if tz is not None:
+        ts -= tz * 60 * 1000
+    return ts, tz
+
+def _column_names(conn, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+def _init_taken_ts(conn):
+    """
+    촬영일시를 정수(epoch ms) 컬럼으로 저장해서 날짜 범위 검색을 인덱스로 처리.
+    - taken_ts: UTC epoch 밀리초
+    - taken_tz: 촬영지 UTC 오프셋(분), 모르면 NULL
+    컬럼이 처음 추가될 때 기존 taken_date 문자열에서 백필.
+    """
+    if "taken_ts" not in _column_names(conn, "items"):
+        conn.execute("ALTER TABLE items ADD COLUMN taken_ts INTEGER")
+        conn.execute("ALTER TABLE items ADD COLUMN taken_tz INTEGER")
+
+        rows = conn.execute(
+            "SELECT id, taken_date FROM items WHERE taken_date IS NOT NULL"
+        ).fetchall()
+        updates = []
+        for item_id, taken_date in rows:
+            parsed = parse_exif_datetime(taken_date)
+            if parsed is not None:
+                updates.append((parsed[0], parsed[1], item_id))
+        conn.executemany(
+            "UPDATE items SET taken_ts = ?, taken_tz = ? WHERE id = ?", updates
+        )
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_taken_ts ON items(taken_ts)")
+
+# ----------------------------
+# 지각 해시(dHash 64비트) 유사 사진 인덱스
+# 64비트를 16비트씩 4칸(band)으로 나눠 칸마다 인덱스.
+# 해밍 거리 d 이내인 두 해시는 적어도 한 칸에서 d // 4 비트 이하만 다르므로
+# (비둘기집 원리) 각 칸의 "d // 4 비트 이내 변형값" 을 인덱스로 찾으면 빠짐없이 후보가 나온다.
+# ----------------------------
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 16
+
+# 이 거리 이하면 같은 사진(연사/리사이즈/재압축)으로 보고 탐지 결과를 재사용
+NEAR_DUP_DISTANCE = 5
+# 밝기 변화가 거의 없는 사진(단색/빈 화면/한 방향 그라데이션)은 dHash 가 0(또는 전부 1) 근처로 몰려서
+# 서로 다른 사진끼리도 "거의 같음" 이 됨 → 1 비트 수가 이 범위 밖이면 복제 판정/결과 재사용 안 함
+PHASH_MIN_BITS = 8
+
+def is_informative_phash(phash: int) -> bool:
+    bits = _to_unsigned64(phash).bit_count()
+    return PHASH_MIN_BITS <= bits <= 64 - PHASH_MIN_BITS
+
+def _to_signed64(value: int) -> int:
+    # SQLite INTEGER 는 부호 있는 64비트
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _to_unsigned64(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+def _phash_bands(phash: int) -> List[int]:
+    mask = (1 << PHASH_BAND_BITS) - 1
+    return [(phash >> (PHASH_BAND_BITS * i)) & mask for i in range(PHASH_BANDS)]
+
+def _band_variants(band: int, radius: int) -> List[int]:
+    """
+    band 에서 radius 비트 이하를 뒤집은 모든 값
+    """
+    values = [band]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(PHASH_BAND_BITS), r):
+            v = band
+            for b in bits:
+                v ^= 1 << b
+            values.append(v)
+    return values
+
+def _init_phash(conn):
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS item_phash (
+        item_id INTEGER PRIMARY KEY,
+        phash INTEGER NOT NULL,           -- dHash 64비트 (부호 있는 정수로 저장)
+        dup_of INTEGER,                   -- 거의 같은 원본 사진의 item id
+        b0 INTEGER NOT NULL,
+        b1 INTEGER NOT NULL,
+        b2 INTEGER NOT NULL,
+        b3 INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_item_phash_b0 ON item_phash(b0);
+    CREATE INDEX IF NOT EXISTS idx_item_phash_b1 ON item_phash(b1);
+    CREATE INDEX IF NOT EXISTS idx_item_phash_b2 ON item_phash(b2);
+    CREATE INDEX IF NOT EXISTS idx_item_phash_b3 ON item_phash(b3);
+    CREATE INDEX IF NOT EXISTS idx_item_phash_dup_of ON item_phash(dup_of);
+
+    CREATE TRIGGER IF NOT EXISTS items_phash_ad AFTER DELETE ON items BEGIN
+        DELETE FROM item_phash WHERE item_id = old.id;
+    END;
+    """)
+
+def _phash_row(item_id: int, phash: int, dup_of: Optional[int]):
+    return (item_id, _to_signed64(phash), dup_of, *_phash_bands(phash))
+
+def _similar_hashes(conn, phash: int, max_distance: int) -> List[Tuple[int, int, Optional[int]]]:
+    """
+    해밍 거리 max_distance 이내인 (item_id, 거리, dup_of) 목록 (가까운 순)
+    """
+    radius = max_distance // PHASH_BANDS
+    selects, params = [], []
+    for i, band in enumerate(_phash_bands(phash)):
+        variants = _band_variants(band, radius)
+        selects.append(
+            f"SELECT item_id, phash, dup_of FROM item_phash WHERE b{i} IN ({', '.join('?' for _ in variants)})"
+        )
+        params += variants
+    rows = conn.execute(" UNION ".join(selects), params).fetchall()
+
+    found = []
+    for item_id, other, dup_of in rows:
+        dist = (phash ^ _to_unsigned64(other)).bit_count()
+        if dist <= max_distance:
+            found.append((item_id, dist, dup_of))
+    found.sort(key=lambda x: (x[1], x[0]))
+    return found
+
+def find_near_duplicate(phash: int, max_distance: int = NEAR_DUP_DISTANCE) -> Optional[Dict[str, Any]]:
+    """
+    가장 가까운 기존 사진 (원본 기준) -> {"item_id", "distance", "content_hash", "objects"}
+    - 찾은 사진이 이미 다른 사진의 복제본이면 그 원본을 돌려줌
+    - 밝기 변화가 거의 없는 해시(is_informative_phash 가 False)는 None
+    """
+    if not is_informative_phash(phash):
+        return None
+    with get_conn() as conn:
+        found = _similar_hashes(conn, phash, max_distance)
+        if not found:
+            return None
+        item_id, dist, dup_of = found[0]
+        root = dup_of if dup_of is not None else item_id
+        row = conn.execute(
+            "SELECT content_hash, objects FROM items WHERE id = ?", (root,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "item_id": root,
+        "distance": dist,
+        "content_hash": row[0],
+        "objects": [o for o in (row[1] or "").split(",") if o],
+    }
+
+def find_similar_photos(
+    item_id: Optional[int] = None,
+    phash: Optional[int] = None,
+    max_distance: int = 10,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    비슷한 사진 찾기 (사진 id 또는 dHash 로)
+    반환: items 행 + "distance"(해밍 거리), 가까운 순
+    """
+    with get_conn() as conn:
+        if phash is None:
+            row = conn.execute(
+                "SELECT phash FROM item_phash WHERE item_id = ?", (item_id,)
+            ).fetchone()
+            if row is None:
+                return []
+            phash = _to_unsigned64(row[0])
+
+        found = [f for f in _similar_hashes(conn, phash, max_distance) if f[0] != item_id][:limit]
+        if not found:
+            return []
+
+        cols = ", ".join(ITEM_COLUMNS)
+        marks = ", ".join("?" for _ in found)
+        rows = conn.execute(
+            f"SELECT {cols} FROM items WHERE id IN ({marks})", [f[0] for f in found]
+        ).fetchall()
+
+    by_id = {r[0]: dict(zip(ITEM_COLUMNS, r)) for r in rows}
+    results = []
+    for fid, dist, _ in found:
+        if fid in by_id:
+            results.append({**by_id[fid], "distance": dist})
+    return results
+
+def find_similar_photos_many(
+    item_ids: Iterable[int],
+    max_distance: int = 10,
+    limit: int = 20,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    find_similar_photos 를 여러 사진에 한 번에 (검색 결과 한 페이지용)
+    칸별 변형값을 임시 테이블에 넣고 칸마다 인덱스 조인 1번 → 사진 수와 상관없이 질의 몇 개
+    반환: {item_id: [items 행 + "distance"]} (비슷한 사진이 없으면 빠짐)
+    """
+    item_ids = list(dict.fromkeys(item_ids))
+    if not item_ids:
+        return {}
+    radius = max_distance // PHASH_BANDS
+    with get_conn() as conn:
+        marks = ", ".join("?" for _ in item_ids)
+        hashes = {
+            item_id: _to_unsigned64(phash)
+            for item_id, phash in conn.execute(
+                f"SELECT item_id, phash FROM item_phash WHERE item_id IN ({marks})", item_ids
+            )
+        }
+        if not hashes:
+            return {}
+
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS phash_probe (qid INTEGER, band INTEGER, value INTEGER)")
+        conn.execute("DELETE FROM phash_probe")
+        conn.executemany(
+            "INSERT INTO phash_probe VALUES (?, ?, ?)",
+            [
+                (qid, i, v)
+                for qid, phash in hashes.items()
+                for i, band in enumerate(_phash_bands(phash))
+                for v in _band_variants(band, radius)
+            ],
+        )
+        rows = conn.execute(" UNION ".join(
+            f"SELECT p.qid, h.item_id, h.phash FROM phash_probe p "
+            f"JOIN item_phash h ON h.b{i} = p.value WHERE p.band = {i}"
+            for i in range(PHASH_BANDS)
+        )).fetchall()
+        conn.execute("DELETE FROM phash_probe")
+
+        found: Dict[int, List[Tuple[int, int]]] = {}
+        for qid, other_id, other in rows:
+            dist = (hashes[qid] ^ _to_unsigned64(other)).bit_count()
+            if other_id != qid and dist <= max_distance:
+                found.setdefault(qid, []).append((dist, other_id))
+        for qid in found:
+            found[qid] = sorted(found[qid])[:limit]
+
+        other_ids = sorted({fid for lst in found.values() for _, fid in lst})
+        by_id = {}
+        if other_ids:
+            cols = ", ".join(ITEM_COLUMNS)
+            marks = ", ".join("?" for _ in other_ids)
+            by_id = {
+                r[0]: dict(zip(ITEM_COLUMNS, r))
+                for r in conn.execute(f"SELECT {cols} FROM items WHERE id IN ({marks})", other_ids)
+            }
+
+    results = {}
+    for qid, lst in found.items():
+        similar = [{**by_id[fid], "distance": dist} for dist, fid in lst if fid in by_id]
+        if similar:
+            results[qid] = similar
+    return results
+
+def link_duplicates(pairs: Iterable[Tuple[int, int]]):
+    """
+    (item_id, 원본 item_id) 쌍으로 복제 관계 기록
+    """
+    with get_conn() as conn:
+        conn.executemany(
+            "UPDATE item_phash SET dup_of = ? WHERE item_id = ?",
+            [(orig, item_id) for item_id, orig in pairs],
+        )
 
 def init_db():
     with get_conn() as conn:
@@ -24,6 +678,78 @@ def init_db():
             created_at TEXT DEFAULT (datetime('now'))
         )
         """)
+        _init_fts(conn)
+        _init_label_tables(conn)
+        _init_geo_index(conn)
+        _init_taken_ts(conn)
+        _init_phash(conn)
+        if "content_hash" not in _column_names(conn, "items"):
+            # 이미지 내용 해시 (일괄 저장 재시작 시 이미 저장한 파일 건너뛰기용)
+            conn.execute("ALTER TABLE items ADD COLUMN content_hash TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_items_content_hash ON items(content_hash)")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            cache_key TEXT PRIMARY KEY,       -- content hash + 분석 설정
+            content_hash TEXT NOT NULL,
+            result TEXT NOT NULL,             -- JSON (EXIF 메타데이터 + 객체 탐지 결과)
+            last_used REAL NOT NULL
+        )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache(last_used)"
+        )
+        # 캐시 크기를 매번 COUNT/SUM 하지 않도록 값만 따로 들고 있음 (처음 한 번만 계산)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO cache_stats (name, value) "
+            "SELECT 'analysis_cache_entries', COUNT(*) FROM analysis_cache"
+        )
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS thumbnails (
+            content_hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL,               -- WebP(또는 JPEG) 썸네일
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_thumbnails_last_used ON thumbnails(last_used)"
+        )
+        # 용량 초과 시 오래된 순서로 지울 후보를 BLOB 이 있는 테이블 대신 인덱스만 읽어서 고름
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_thumbnails_lru_size ON thumbnails(last_used, content_hash, size)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO cache_stats (name, value) "
+            "SELECT 'thumbnail_bytes', COALESCE(SUM(size), 0) FROM thumbnails"
+        )
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_name TEXT NOT NULL,
+            data BLOB,                        -- 처리 전 이미지 (끝나면 비움)
+            status TEXT NOT NULL DEFAULT 'queued',  -- queued / running / done / failed
+            progress REAL NOT NULL DEFAULT 0,
+            result TEXT,                      -- JSON (메타데이터/객체/키워드)
+            error TEXT,
+            item_id INTEGER,
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now')),
+            owner TEXT,                       -- 처리 중인 워커 풀 id (프로세스마다 다름)
+            heartbeat REAL                    -- owner 가 마지막으로 살아 있다고 알린 시각 (epoch 초)
+        )
+        """)
+        if "owner" not in _column_names(conn, "ingest_jobs"):
+            conn.execute("ALTER TABLE ingest_jobs ADD COLUMN owner TEXT")
+            conn.execute("ALTER TABLE ingest_jobs ADD COLUMN heartbeat REAL")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status, id)"
+        )
         conn.commit()
 
 def insert_photo(
@@ -35,59 +761,879 @@ def insert_photo(
     gps_lon: Optional[float],
     objects: List[str],
     keywords: List[str],
-):
+    object_confs: Optional[List[float]] = None,
+    taken_subsec: Optional[str] = None,
+    taken_offset: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    phash: Optional[int] = None,
+    dup_of: Optional[int] = None,
+    thumbnail: Optional[bytes] = None,
+) -> int:
+    return insert_photos([{
+        "file_name": file_name,
+        "taken_date": taken_date,
+        "taken_subsec": taken_subsec,
+        "taken_offset": taken_offset,
+        "camera_make": camera_make,
+        "camera_model": camera_model,
+        "gps_lat": gps_lat,
+        "gps_lon": gps_lon,
+        "objects": objects,
+        "keywords": keywords,
+        "object_confs": object_confs,
+        "content_hash": content_hash,
+        "phash": phash,
+        "dup_of": dup_of,
+        "thumbnail": thumbnail,
+    }])[0]
+
+INSERT_BATCH_SIZE = 500
+
+def insert_photos(
+    records: Iterable[Dict[str, Any]],
+    batch_size: int = INSERT_BATCH_SIZE,
+) -> List[int]:
+    """
+    사진 여러 장을 한 번에 저장 (대량 백필용)
+    - records: insert_photo 인자와 같은 키를 가진 dict 의 iterable/generator
+      (file_name, taken_date, camera_make, camera_model, gps_lat, gps_lon,
+       objects, keywords, object_confs, taken_subsec, taken_offset, content_hash,
+       phash, dup_of, thumbnail)
+    - batch_size 개씩 executemany + 배치당 트랜잭션 1번(커밋 1번)
+    반환: 입력 순서대로 부여된 id 리스트
+    """
+    ids: List[int] = []
+    batch: List[Dict[str, Any]] = []
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= batch_size:
+            ids.extend(_insert_photo_batch(batch))
+            batch = []
+    if batch:
+        ids.extend(_insert_photo_batch(batch))
+    return ids
+
+def _insert_photo_batch(batch: List[Dict[str, Any]]) -> List[int]:
+    rows = []
+    for r in batch:
+        taken = parse_exif_datetime(
+            r.get("taken_date"), r.get("taken_subsec"), r.get("taken_offset")
+        ) or (None, None)
+        rows.append((
+            r["file_name"],
+            r.get("taken_date"),
+            taken[0],
+            taken[1],
+            r.get("camera_make"),
+            r.get("camera_model"),
+            r.get("gps_lat"),
+            r.get("gps_lon"),
+            ",".join(r.get("objects") or []),
+            ",".join(r.get("keywords") or []),
+            r.get("content_hash"),
+        ))
+
     with get_conn() as conn:
-        conn.execute(
+        conn.executemany(
             """
             INSERT INTO items
-            (file_name, item_type, taken_date, camera_make, camera_model, gps_lat, gps_lon, objects, keywords)
-            VALUES (?, 'photo', ?, ?, ?, ?, ?, ?, ?)
+            (file_name, item_type, taken_date, taken_ts, taken_tz, camera_make, camera_model, gps_lat, gps_lon, objects, keywords, content_hash)
+            VALUES (?, 'photo', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (
-                file_name,
-                taken_date,
-                camera_make,
-                camera_model,
-                gps_lat,
-                gps_lon,
-                ",".join(objects),
-                ",".join(keywords),
-            ),
+            rows,
         )
-        conn.commit()
+        # 한 트랜잭션 안의 AUTOINCREMENT id 는 연속이므로 마지막 id 에서 역산
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        ids = list(range(last_id - len(rows) + 1, last_id + 1))
 
-def search_items(query: str) -> List[Dict[str, Any]]:
-    q = query.strip()
-    if not q:
-        return []
+        object_rows, keyword_rows, phash_rows = [], [], []
+        for item_id, r in zip(ids, batch):
+            o_rows, k_rows = _item_label_rows(
+                item_id,
+                r.get("objects") or [],
+                r.get("object_confs"),
+                r.get("keywords") or [],
+            )
+            object_rows.extend(o_rows)
+            keyword_rows.extend(k_rows)
+            if r.get("phash") is not None:
+                phash_rows.append(_phash_row(item_id, r["phash"], r.get("dup_of")))
+        _insert_item_labels(conn, object_rows, keyword_rows)
+        conn.executemany(
+            "INSERT OR REPLACE INTO item_phash (item_id, phash, dup_of, b0, b1, b2, b3) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            phash_rows,
+        )
+        thumb_rows = [
+            (r["content_hash"], r["thumbnail"])
+            for r in batch
+            if r.get("thumbnail") and r.get("content_hash")
+        ]
+        if thumb_rows:
+            _put_thumbnails(conn, thumb_rows)
+    return ids
 
-    like = f"%{q}%"
+def find_item_by_content_hash(content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    같은 내용으로 이미 저장된 사진 1개 -> items 행 (objects/keywords 는 리스트로), 없으면 None
+    """
+    cols = ", ".join(ITEM_COLUMNS)
     with get_conn() as conn:
-        cur = conn.execute(
-            """
-            SELECT id, file_name, item_type, taken_date, camera_make, camera_model, gps_lat, gps_lon, objects, keywords, created_at
-            FROM items
-            WHERE keywords LIKE ? OR objects LIKE ? OR file_name LIKE ? OR taken_date LIKE ? OR camera_make LIKE ? OR camera_model LIKE ?
-            ORDER BY id DESC
+        row = conn.execute(
+            f"SELECT {cols} FROM items WHERE content_hash = ? ORDER BY id LIMIT 1", (content_hash,)
+        ).fetchone()
+    if row is None:
+        return None
+    item = dict(zip(ITEM_COLUMNS, row))
+    item["objects"] = [o for o in (item["objects"] or "").split(",") if o]
+    item["keywords"] = _split_keywords(item["keywords"])
+    return item
+
+def has_content_hash(content_hash: str) -> bool:
+    """
+    같은 내용의 사진이 이미 저장돼 있는지
+    """
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM items WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone()
+    return row is not None
+
+def _fts_query(q: str) -> str:
+    """
+    사용자 검색어 -> FTS5 MATCH 식
+    공백으로 나눈 각 단어를 따옴표로 감싸고 접두사 검색(*)으로 AND 결합
+    예) 'iPhone 2026' -> '"iPhone"* "2026"*'
+    """
+    terms = []
+    for t in q.split():
+        t = t.replace('"', '""')
+        terms.append(f'"{t}"*')
+    return " ".join(terms)
+
+TimeBound = Union[int, datetime, date, None]
+
+def _ts_bound(value: TimeBound, end: bool = False) -> Optional[int]:
+    """
+    검색 범위 경계 -> epoch ms
+    - int 는 그대로 epoch ms
+    - naive datetime/date 는 taken_ts 와 같은 규칙(현지 시각=UTC)으로 변환
+    - end=True 이고 date 면 그날 끝까지 포함 (다음날 0시, 미포함)
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+        if end:
+            value += timedelta(days=1)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+def _time_filter(alias: str, ts_from: Optional[int], ts_to: Optional[int]):
+    """
+    taken_ts 범위 조건 (인덱스 범위 스캔) -> (" AND ...", params)
+    """
+    sql, params = "", []
+    if ts_from is not None:
+        sql += f" AND {alias}.taken_ts >= ?"
+        params.append(ts_from)
+    if ts_to is not None:
+        sql += f" AND {alias}.taken_ts < ?"
+        params.append(ts_to)
+    return sql, params
+
+FETCH_BATCH_SIZE = 200
+
+def _iter_rows(cur, cols: List[str], batch_size: int = FETCH_BATCH_SIZE):
+    """
+    커서에서 fetchmany 로 조금씩 읽어 dict 로 yield (메모리 일정)
+    """
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        for r in rows:
+            yield dict(zip(cols, r))
+
+def _search_sql(
+    q: str,
+    taken_from: TimeBound,
+    taken_to: TimeBound,
+    use_fts: bool,
+    after_id: Optional[int] = None,
+    after_score: Optional[float] = None,
+    count_only: bool = False,
+):
+    """
+    search_items 계열 공통 SQL -> (sql, params) 또는 검색 조건이 없으면 None
+    정렬/커서(keyset):
+    - FTS: (score, id DESC) -> 다음 페이지는 after_score + after_id
+    - 그 외: id DESC -> 다음 페이지는 after_id
+    """
+    time_sql, time_params = _time_filter("i", _ts_bound(taken_from), _ts_bound(taken_to, end=True))
+    if not q and not time_params:
+        return None
+
+    cols = ", ".join(f"i.{c}" for c in ITEM_COLUMNS)
+    params: list = []
+
+    if q and use_fts:
+        # BM25 점수 순 (값이 작을수록 관련도 높음)
+        select = "COUNT(*)" if count_only else f"{cols}, f.score"
+        sql = f"""
+            SELECT {select}
+            FROM (
+                SELECT rowid, bm25(items_fts) AS score
+                FROM items_fts
+                WHERE items_fts MATCH ?
+            ) f
+            JOIN items i ON i.id = f.rowid
+            WHERE 1=1 {time_sql}
+        """
+        params += [_fts_query(q), *time_params]
+        if after_id is not None and after_score is not None:
+            sql += " AND (f.score > ? OR (f.score = ? AND i.id < ?))"
+            params += [after_score, after_score, after_id]
+        order = " ORDER BY f.score, i.id DESC"
+    else:
+        select = "COUNT(*)" if count_only else f"{cols}, NULL"
+        where = "1=1"
+        if q:
+            # FTS5 를 쓸 수 없을 때의 대체 검색 (전체 테이블 LIKE 스캔)
+            where = "(i.keywords LIKE ? OR i.objects LIKE ? OR i.file_name LIKE ? OR i.taken_date LIKE ? OR i.camera_make LIKE ? OR i.camera_model LIKE ?)"
+            params += [f"%{q}%"] * 6
+        sql = f"""
+            SELECT {select}
+            FROM items i
+            WHERE {where} {time_sql}
+        """
+        params += time_params
+        if after_id is not None:
+            sql += " AND i.id < ?"
+            params.append(after_id)
+        order = " ORDER BY i.id DESC"
+
+    if not count_only:
+        sql += order
+    return sql, params
+
+def _execute_search(
+    conn,
+    q: str,
+    taken_from: TimeBound,
+    taken_to: TimeBound,
+    after_id: Optional[int] = None,
+    after_score: Optional[float] = None,
+    count_only: bool = False,
+    limit: Optional[int] = None,
+):
+    """
+    검색 실행 -> 커서 (검색 조건이 없으면 None)
+    FTS5 로 먼저 실행하고, 검색어를 FTS 문법으로 해석할 수 없으면(OperationalError) LIKE 검색으로 다시
+    """
+    def run(use_fts, a_id, a_score):
+        built = _search_sql(q, taken_from, taken_to, use_fts, a_id, a_score, count_only)
+        if built is None:
+            return None
+        sql, params = built
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return conn.execute(sql, params)
+
+    if q and _table_exists(conn, "items_fts"):
+        # FTS 커서는 (score, id) 쌍 - 하나만 주면 조건이 빠져서 같은 페이지가 반복되므로 실행 전에 오류
+        # (_fts_query 가 단어를 모두 따옴표로 감싸서 FTS 해석 실패 → LIKE 로 가는 일은 사실상 없음)
+        if (after_id is None) != (after_score is None):
+            raise ValueError("FTS 검색의 다음 페이지는 after_id 와 after_score 를 함께 넘겨야 합니다")
+        try:
+            return run(True, after_id, after_score)
+        except sqlite3.OperationalError:
+            pass  # FTS 문법으로 해석할 수 없는 검색어 → 아래 LIKE 검색
+    return run(False, after_id, after_score)
+
+def iter_search_items(
+    query: str,
+    taken_from: TimeBound = None,
+    taken_to: TimeBound = None,
+    after_id: Optional[int] = None,
+    after_score: Optional[float] = None,
+    limit: Optional[int] = None,
+):
+    """
+    search_items 의 generator 버전: 커서에서 결과를 조금씩 읽어 yield
+    """
+    # 읽기 전용이라 커밋이 필요 없으므로 with 블록 없이 커서만 유지
+    conn = get_conn()
+    cur = _execute_search(conn, query.strip(), taken_from, taken_to, after_id, after_score, limit=limit)
+    if cur is None:
+        return
+    yield from _iter_rows(cur, ITEM_COLUMNS + ["score"])
+
+def search_items(
+    query: str,
+    taken_from: TimeBound = None,
+    taken_to: TimeBound = None,
+    after_id: Optional[int] = None,
+    after_score: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    키워드/메타데이터 검색 (+ 선택: 촬영일시 범위)
+    - taken_from 이상, taken_to 미만 (date 로 주면 그날까지 포함)
+    - 검색어 없이 범위만 주면 그 기간의 사진을 최신순으로 반환
+    - limit 개씩 페이지로 가져오기: 이전 페이지 마지막 행의
+      id, score 를 after_id, after_score 로 넘기면 다음 페이지
+      (FTS 결과는 score 가 있으므로 둘 다 필요, 하나만 주면 ValueError)
+    """
+    return list(iter_search_items(query, taken_from, taken_to, after_id, after_score, limit))
+
+def count_search_items(
+    query: str,
+    taken_from: TimeBound = None,
+    taken_to: TimeBound = None,
+) -> int:
+    """
+    search_items 전체 결과 개수 (행을 가져오지 않는 COUNT 질의)
+    """
+    with get_conn() as conn:
+        cur = _execute_search(conn, query.strip(), taken_from, taken_to, count_only=True)
+        return 0 if cur is None else cur.fetchone()[0]
+
+def taken_histogram(
+    unit: str = "month",
+    taken_from: TimeBound = None,
+    taken_to: TimeBound = None,
+) -> List[Dict[str, Any]]:
+    """
+    촬영일시 기준 일별/월별 사진 수
+    - unit: "day" -> "2026-01-15", "month" -> "2026-01"
+    - 구간은 촬영지 현지 시각 기준 (taken_tz 가 있으면 반영)
+    """
+    fmt = {"day": "%Y-%m-%d", "month": "%Y-%m"}[unit]
+    time_sql, time_params = _time_filter("i", _ts_bound(taken_from), _ts_bound(taken_to, end=True))
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT strftime(?, i.taken_ts / 1000 + COALESCE(i.taken_tz, 0) * 60, 'unixepoch') AS period,
+                   COUNT(*)
+            FROM items i
+            WHERE i.taken_ts IS NOT NULL {time_sql}
+            GROUP BY period
+            ORDER BY period
             """,
-            (like, like, like, like, like, like),
-        )
-        rows = cur.fetchall()
+            (fmt, *time_params),
+        ).fetchall()
 
-    cols = ["id","file_name","item_type","taken_date","camera_make","camera_model","gps_lat","gps_lon","objects","keywords","created_at"]
+    cols = ["period", "count"]
     return [dict(zip(cols, r)) for r in rows]
 
-def list_photos_with_location() -> List[Dict[str, Any]]:
+def iter_photos_with_location(
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+):
+    """
+    위치가 있는 사진을 최신순으로 조금씩 읽어 yield
+    """
+    sql = """
+        SELECT id, file_name, gps_lat, gps_lon, taken_date, keywords
+        FROM items
+        WHERE item_type='photo' AND gps_lat IS NOT NULL AND gps_lon IS NOT NULL
+    """
+    params: list = []
+    if after_id is not None:
+        sql += " AND id < ?"
+        params.append(after_id)
+    sql += " ORDER BY id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    cols = ["id","file_name","gps_lat","gps_lon","taken_date","keywords"]
+    yield from _iter_rows(get_conn().execute(sql, params), cols)
+
+def list_photos_with_location(
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    위치가 있는 사진 목록 (최신순)
+    다음 페이지: 이전 페이지 마지막 id 를 after_id 로 전달
+    """
+    return list(iter_photos_with_location(after_id, limit))
+
+def count_photos_with_location() -> int:
     with get_conn() as conn:
-        cur = conn.execute(
+        if _table_exists(conn, "items_geo"):
+            return conn.execute("SELECT COUNT(*) FROM items_geo").fetchone()[0]
+        return conn.execute(
             """
-            SELECT id, file_name, gps_lat, gps_lon, taken_date, keywords
+            SELECT COUNT(*)
             FROM items
             WHERE item_type='photo' AND gps_lat IS NOT NULL AND gps_lon IS NOT NULL
-            ORDER BY id DESC
             """
+        ).fetchone()[0]
+
+def _geo_source(conn):
+    """
+    좌표 범위 질의에 쓸 (FROM/WHERE 절, 위도 컬럼, 경도 컬럼, id 컬럼)
+    R*Tree 가 있으면 items_geo, 없으면 items + 일반 인덱스
+    R*Tree 는 float32 로 저장되므로 겹침(overlap) 조건으로 질의한다.
+    """
+    if _table_exists(conn, "items_geo"):
+        return (
+            "FROM items_geo WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?",
+            "min_lat", "min_lon", "id",
         )
-        rows = cur.fetchall()
+    return (
+        "FROM items WHERE item_type='photo' AND gps_lat BETWEEN ? AND ? AND gps_lon BETWEEN ? AND ?",
+        "gps_lat", "gps_lon", "id",
+    )
+
+def photo_location_bounds() -> Optional[Dict[str, float]]:
+    """
+    위치가 있는 사진 전체의 좌표 범위 (없으면 None)
+    """
+    with get_conn() as conn:
+        if _table_exists(conn, "items_geo"):
+            row = conn.execute(
+                "SELECT MIN(min_lat), MIN(min_lon), MAX(max_lat), MAX(max_lon) FROM items_geo"
+            ).fetchone()
+        else:
+            row = conn.execute(
+                """
+                SELECT MIN(gps_lat), MIN(gps_lon), MAX(gps_lat), MAX(gps_lon)
+                FROM items
+                WHERE item_type='photo' AND gps_lat IS NOT NULL AND gps_lon IS NOT NULL
+                """
+            ).fetchone()
+
+    if row is None or row[0] is None:
+        return None
+    return dict(zip(["min_lat", "min_lon", "max_lat", "max_lon"], row))
+
+def list_photos_in_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    지도 화면(위/경도 사각형) 안의 사진 목록 (최신순)
+    """
+    params: list = [min_lat, max_lat, min_lon, max_lon]
+    with get_conn() as conn:
+        if _table_exists(conn, "items_geo"):
+            sql = """
+                SELECT i.id, i.file_name, i.gps_lat, i.gps_lon, i.taken_date, i.keywords
+                FROM items_geo g
+                JOIN items i ON i.id = g.id
+                WHERE g.max_lat >= ? AND g.min_lat <= ? AND g.max_lon >= ? AND g.min_lon <= ?
+                  AND i.gps_lat BETWEEN ? AND ? AND i.gps_lon BETWEEN ? AND ?
+                ORDER BY i.id DESC
+            """
+            params += [min_lat, max_lat, min_lon, max_lon]
+        else:
+            sql = """
+                SELECT id, file_name, gps_lat, gps_lon, taken_date, keywords
+                FROM items
+                WHERE item_type='photo' AND gps_lat BETWEEN ? AND ? AND gps_lon BETWEEN ? AND ?
+                ORDER BY id DESC
+            """
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = conn.execute(sql, params).fetchall()
 
     cols = ["id","file_name","gps_lat","gps_lon","taken_date","keywords"]
     return [dict(zip(cols, r)) for r in rows]
+
+def cluster_photos_in_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    max_points: int = 400,
+) -> List[Dict[str, Any]]:
+    """
+    지도 화면을 격자로 나눠 칸마다 사진을 하나의 점으로 묶음 (서버 측 클러스터링)
+    - 최대 max_points 개의 점만 반환
+    - 각 점: 평균 좌표(lat, lon), 사진 수(count), 대표 사진 id(sample_id)
+    """
+    grid = max(1, int(max_points ** 0.5))
+    cell_lat = max(max_lat - min_lat, 1e-9) / grid
+    cell_lon = max(max_lon - min_lon, 1e-9) / grid
+
+    with get_conn() as conn:
+        from_where, lat_col, lon_col, id_col = _geo_source(conn)
+        rows = conn.execute(
+            f"""
+            SELECT
+                MIN(CAST(({lat_col} - ?) / ? AS INTEGER), ?) AS cy,
+                MIN(CAST(({lon_col} - ?) / ? AS INTEGER), ?) AS cx,
+                AVG({lat_col}), AVG({lon_col}), COUNT(*), MAX({id_col})
+            {from_where}
+            GROUP BY cy, cx
+            """,
+            (
+                min_lat, cell_lat, grid - 1,
+                min_lon, cell_lon, grid - 1,
+                min_lat, max_lat, min_lon, max_lon,
+            ),
+        ).fetchall()
+
+    cols = ["lat", "lon", "count", "sample_id"]
+    return [dict(zip(cols, r[2:])) for r in rows]
+
+def _fetch_items_by_ids(conn, id_sql: str, params) -> List[Dict[str, Any]]:
+    """
+    id_sql: item id 목록을 돌려주는 서브쿼리
+    """
+    cols = ", ".join(ITEM_COLUMNS)
+    cur = conn.execute(
+        f"""
+        SELECT {cols}
+        FROM items
+        WHERE id IN ({id_sql})
+        ORDER BY id DESC
+        """,
+        params,
+    )
+    return [dict(zip(ITEM_COLUMNS, r)) for r in cur.fetchall()]
+
+def find_items_by_object(label: str) -> List[Dict[str, Any]]:
+    """
+    객체 라벨 정확 일치 검색 (예: 'car' 는 'carrot' 과 매칭되지 않음)
+    """
+    return find_items_by_objects([label])
+
+def find_items_by_objects(labels: List[str], match_all: bool = True) -> List[Dict[str, Any]]:
+    """
+    여러 객체 라벨로 검색
+    - match_all=True: 모든 라벨을 포함한 사진 (AND)
+    - match_all=False: 하나라도 포함한 사진 (OR)
+    """
+    labels = list(dict.fromkeys(l.strip() for l in labels if l and l.strip()))
+    if not labels:
+        return []
+
+    marks = ", ".join("?" for _ in labels)
+    if match_all:
+        id_sql = f"""
+            SELECT item_id FROM item_objects
+            WHERE label IN ({marks})
+            GROUP BY item_id
+            HAVING COUNT(*) = ?
+        """
+        params = (*labels, len(labels))
+    else:
+        id_sql = f"SELECT item_id FROM item_objects WHERE label IN ({marks})"
+        params = tuple(labels)
+
+    with get_conn() as conn:
+        return _fetch_items_by_ids(conn, id_sql, params)
+
+def find_items_by_keyword(keyword: str) -> List[Dict[str, Any]]:
+    """
+    키워드 정확 일치 검색
+    """
+    keyword = keyword.strip()
+    if not keyword:
+        return []
+    with get_conn() as conn:
+        return _fetch_items_by_ids(
+            conn, "SELECT item_id FROM item_keywords WHERE keyword = ?", (keyword,)
+        )
+
+def object_facets(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    객체 라벨별 집계: 사진 수(photos), 전체 탐지 수(detections)
+    """
+    sql = """
+        SELECT label, COUNT(*) AS photos, SUM(count) AS detections
+        FROM item_objects
+        GROUP BY label
+        ORDER BY photos DESC, label
+    """
+    params: tuple = ()
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (limit,)
+    with get_conn() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    cols = ["label", "photos", "detections"]
+    return [dict(zip(cols, r)) for r in rows]
+
+def keyword_facets(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    키워드별 사진 수 집계
+    """
+    sql = """
+        SELECT keyword, COUNT(*) AS photos
+        FROM item_keywords
+        GROUP BY keyword
+        ORDER BY photos DESC, keyword
+    """
+    params: tuple = ()
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (limit,)
+    with get_conn() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    cols = ["keyword", "photos"]
+    return [dict(zip(cols, r)) for r in rows]
+
+# 분석 캐시 최대 항목 수 (넘으면 가장 오래 안 쓴 것부터 ANALYSIS_CACHE_LOW_ENTRIES 개까지 삭제)
+ANALYSIS_CACHE_MAX_ENTRIES = 50_000
+ANALYSIS_CACHE_LOW_ENTRIES = ANALYSIS_CACHE_MAX_ENTRIES * 9 // 10
+
+def _bump_cache_stat(conn, name: str, delta: int) -> int:
+    """
+    cache_stats 값 += delta (같은 트랜잭션 안에서) -> 새 값
+    """
+    return conn.execute(
+        "UPDATE cache_stats SET value = value + ? WHERE name = ? RETURNING value", (delta, name)
+    ).fetchone()[0]
+
+def get_cached_analysis(cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    분석 캐시 조회 (있으면 마지막 사용 시각 갱신)
+    """
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT result FROM analysis_cache WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE analysis_cache SET last_used = ? WHERE cache_key = ?",
+            (time.time(), cache_key),
+        )
+    return json.loads(row[0])
+
+def put_cached_analysis(cache_key: str, content_hash: str, result: Dict[str, Any]):
+    """
+    분석 결과 저장 + LRU 정리 (ANALYSIS_CACHE_MAX_ENTRIES 를 넘으면 ANALYSIS_CACHE_LOW_ENTRIES 까지 삭제)
+    """
+    with get_conn() as conn:
+        exists = conn.execute(
+            "SELECT 1 FROM analysis_cache WHERE cache_key = ?", (cache_key,)
+        ).fetchone() is not None
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO analysis_cache (cache_key, content_hash, result, last_used)
+            VALUES (?, ?, ?, ?)
+            """,
+            (cache_key, content_hash, json.dumps(result, ensure_ascii=False), time.time()),
+        )
+        total = _bump_cache_stat(conn, "analysis_cache_entries", 0 if exists else 1)
+        if total > ANALYSIS_CACHE_MAX_ENTRIES:
+            removed = conn.execute(
+                """
+                DELETE FROM analysis_cache
+                WHERE cache_key IN (
+                    SELECT cache_key FROM analysis_cache ORDER BY last_used LIMIT ?
+                )
+                """,
+                (total - ANALYSIS_CACHE_LOW_ENTRIES,),
+            ).rowcount
+            _bump_cache_stat(conn, "analysis_cache_entries", -removed)
+
+# ----------------------------
+# 썸네일 캐시 (내용 해시 -> 작은 WebP/JPEG)
+# 원본은 보관하지 않으므로 용량 초과로 지워진 썸네일은 다시 만들지 않음 (화면에선 빈칸)
+# ----------------------------
+THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+THUMBNAIL_CACHE_LOW_BYTES = THUMBNAIL_CACHE_MAX_BYTES * 9 // 10  # 정리 후 목표 크기
+
+def _put_thumbnails(conn, rows: List[Tuple[str, bytes]]):
+    now = time.time()
+    rows = list({h: data for h, data in rows}.items())  # 같은 해시는 마지막 것만
+    replaced = 0  # 덮어쓰는 기존 썸네일 크기 (SQL 변수 개수 제한 때문에 나눠서 조회)
+    for i in range(0, len(rows), 500):
+        hashes = [h for h, _ in rows[i:i + 500]]
+        replaced += conn.execute(
+            f"SELECT COALESCE(SUM(size), 0) FROM thumbnails WHERE content_hash IN ({', '.join('?' for _ in hashes)})",
+            hashes,
+        ).fetchone()[0]
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO thumbnails (content_hash, data, size, last_used)
+        VALUES (?, ?, ?, ?)
+        """,
+        [(h, sqlite3.Binary(data), len(data), now) for h, data in rows],
+    )
+    # 전체 크기는 cache_stats 에 누적 (SUM 을 다시 하지 않음)
+    total = _bump_cache_stat(conn, "thumbnail_bytes", sum(len(d) for _, d in rows) - replaced)
+    if total <= THUMBNAIL_CACHE_MAX_BYTES:
+        return
+    # 한도를 넘었을 때만, 오래 안 쓴 것부터 THUMBNAIL_CACHE_LOW_BYTES 까지 삭제
+    # (한 번 지울 때 여유를 만들어 두어서 매 저장마다 지우지 않음)
+    victims, freed = [], 0
+    for content_hash, size in conn.execute(
+        "SELECT content_hash, size FROM thumbnails ORDER BY last_used, content_hash"
+    ):
+        if total - freed <= THUMBNAIL_CACHE_LOW_BYTES:
+            break
+        victims.append((content_hash,))
+        freed += size
+    conn.executemany("DELETE FROM thumbnails WHERE content_hash = ?", victims)
+    _bump_cache_stat(conn, "thumbnail_bytes", -freed)
+
+def put_thumbnails(rows: Iterable[Tuple[str, bytes]]):
+    """
+    (content_hash, 썸네일 bytes) 저장 + 용량 한도(THUMBNAIL_CACHE_MAX_BYTES) 초과분 LRU 삭제
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    with get_conn() as conn:
+        _put_thumbnails(conn, rows)
+
+def get_thumbnails(item_ids: Iterable[int]) -> Dict[int, bytes]:
+    """
+    사진 id 들의 썸네일 -> {item_id: bytes} (없는 id 는 빠짐)
+    화면에 보이는 한 페이지 분량만 요청하는 용도
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return {}
+    marks = ", ".join("?" for _ in item_ids)
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT i.id, t.content_hash, t.data
+            FROM items i
+            JOIN thumbnails t ON t.content_hash = i.content_hash
+            WHERE i.id IN ({marks})
+            """,
+            item_ids,
+        ).fetchall()
+        conn.executemany(
+            "UPDATE thumbnails SET last_used = ? WHERE content_hash = ?",
+            [(time.time(), h) for _, h, _ in rows],
+        )
+    return {item_id: bytes(data) for item_id, _, data in rows}
+
+# ----------------------------
+# 백그라운드 분석 작업 큐
+# ----------------------------
+JOB_COLUMNS = ["id", "file_name", "status", "progress", "result", "error", "item_id", "created_at", "updated_at"]
+
+def enqueue_job(file_name: str, data: bytes) -> int:
+    """
+    이미지를 분석 대기열에 추가하고 작업 id 반환
+    """
+    with get_conn() as conn:
+        cur = conn.execute(
+            "INSERT INTO ingest_jobs (file_name, data) VALUES (?, ?)",
+            (file_name, bytes(data)),
+        )
+        return cur.lastrowid
+
+# running 작업의 heartbeat 가 이 시간(초) 넘게 갱신되지 않으면 owner 가 죽은 것으로 보고 다시 대기열로
+JOB_STALE_SECONDS = 120
+
+def claim_next_job(owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    가장 오래된 대기 작업 하나를 running 으로 바꾸고 반환 (없으면 None)
+    UPDATE 한 문장이라 여러 워커가 동시에 불러도 같은 작업을 두 번 가져가지 않음
+    owner: 가져가는 워커 풀 id (heartbeat_jobs 로 살아 있음을 알림)
+    """
+    with get_conn() as conn:
+        row = conn.execute(
+            """
+            UPDATE ingest_jobs
+            SET status = 'running', progress = 0, owner = ?, heartbeat = ?, updated_at = datetime('now')
+            WHERE id = (
+                SELECT id FROM ingest_jobs WHERE status = 'queued' ORDER BY id LIMIT 1
+            )
+            RETURNING id, file_name, data
+            """,
+            (owner, time.time()),
+        ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(["id", "file_name", "data"], row))
+
+def update_job_progress(job_id: int, progress: float):
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE ingest_jobs SET progress = ?, updated_at = datetime('now') WHERE id = ?",
+            (progress, job_id),
+        )
+
+def finish_job(job_id: int, result: Dict[str, Any], item_id: Optional[int]):
+    with get_conn() as conn:
+        conn.execute(
+            """
+            UPDATE ingest_jobs
+            SET status = 'done', progress = 1, data = NULL, result = ?, item_id = ?,
+                updated_at = datetime('now')
+            WHERE id = ?
+            """,
+            (json.dumps(result, ensure_ascii=False), item_id, job_id),
+        )
+
+def fail_job(job_id: int, error: str):
+    with get_conn() as conn:
+        conn.execute(
+            """
+            UPDATE ingest_jobs
+            SET status = 'failed', data = NULL, error = ?, updated_at = datetime('now')
+            WHERE id = ?
+            """,
+            (error, job_id),
+        )
+
+def heartbeat_jobs(owner: str) -> int:
+    """
+    owner 가 처리 중인 작업들의 heartbeat 갱신 (워커 풀이 주기적으로 호출)
+    """
+    with get_conn() as conn:
+        cur = conn.execute(
+            "UPDATE ingest_jobs SET heartbeat = ? WHERE status = 'running' AND owner = ?",
+            (time.time(), owner),
+        )
+        return cur.rowcount
+
+def requeue_running_jobs(stale_after: float = JOB_STALE_SECONDS) -> int:
+    """
+    처리 도중 종료된 프로세스가 running 으로 남긴 작업을 다시 대기 상태로
+    heartbeat 가 stale_after 초 넘게 멈춘 작업만 (다른 프로세스가 처리 중인 작업은 그대로)
+    """
+    with get_conn() as conn:
+        cur = conn.execute(
+            """
+            UPDATE ingest_jobs SET status = 'queued', progress = 0, owner = NULL
+            WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)
+            """,
+            (time.time() - stale_after,),
+        )
+        return cur.rowcount
+
+def list_jobs(limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    최근 작업 목록 (이미지 데이터 제외, result 는 dict 로 변환)
+    """
+    cols = ", ".join(JOB_COLUMNS)
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"SELECT {cols} FROM ingest_jobs ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    jobs = [dict(zip(JOB_COLUMNS, r)) for r in rows]
+    for job in jobs:
+        if job["result"]:
+            job["result"] = json.loads(job["result"])
+    return jobs
+
+def count_jobs_by_status() -> Dict[str, int]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status"
+        ).fetchall()
+    return dict(rows)
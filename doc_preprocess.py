@@ -0,0 +1,626 @@
+"""
+실습과제1 문서 이미지 전처리 (gray → 노이즈 제거 → 대비 → 이진화 → 기울기 보정)
+
+Streamlit 화면(1_1452742_sub1.py)은 슬라이더를 움직일 때마다 스크립트 전체가 다시 돌기 때문에,
+단계별 결과를 StageCache 에 (이미지 해시, 이 단계까지의 옵션) 키로 저장해 두고
+바뀐 옵션이 있는 첫 단계부터만 다시 계산한다.
+"""
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def pil_to_np_rgb(pil_image: Image.Image) -> np.ndarray:
+    return np.array(pil_image.convert("RGB"))
+
+
+def np_gray_to_pil(gray: np.ndarray) -> Image.Image:
+    return Image.fromarray(gray)
+
+
+# ----------------------------
+# 기울기(skew) 보정
+# 각도는 축소본(긴 변 DESKEW_WORK_SIZE px)에서만 추정하고, 원본은 마지막에 한 번만 회전
+# - projection : 글자 픽셀을 각도별로 가로줄에 투영했을 때 줄 경계가 가장 뚜렷한 각도 (기본)
+# - hough      : 글자를 가로로 이어 붙인 뒤 Hough 직선들의 각도 중앙값
+# - minarearect: 예전 방식 (원본 전체 글자 픽셀의 최소 외접 사각형, 느리고 메모리 많이 씀)
+# ----------------------------
+DESKEW_METHODS = ("projection", "hough", "minarearect")
+DESKEW_METHOD = "projection"
+DESKEW_MAX_ANGLE = 15.0
+DESKEW_WORK_SIZE = 1024
+
+
+def _skew_work_image(gray: np.ndarray, work_size: int) -> np.ndarray:
+    """
+    각도 추정용 축소 + 이진화 (글자 = 255)
+    """
+    h, w = gray.shape[:2]
+    scale = work_size / max(h, w)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return bw
+
+
+def _skew_projection(bw: np.ndarray, max_angle: float) -> float:
+    ys, xs = np.nonzero(bw)
+    if len(ys) == 0:
+        return 0.0
+    ys = ys.astype(np.float32) - bw.shape[0] / 2
+    xs = xs.astype(np.float32) - bw.shape[1] / 2
+    offset = int(np.hypot(*bw.shape)) + 1
+
+    def score(angle):
+        # getRotationMatrix2D(angle) 로 돌렸을 때의 y 좌표 -> 줄별 글자 픽셀 수
+        a = np.deg2rad(angle)
+        rows = np.rint(ys * np.cos(a) - xs * np.sin(a)).astype(np.int32) + offset
+        profile = np.bincount(rows, minlength=2 * offset).astype(np.float64)
+        return float(np.sum(np.diff(profile) ** 2))
+
+    # 1도 간격으로 훑고, 가장 좋은 각도 주변을 0.1도 간격으로 다시 (±max_angle 밖으로는 안 나감)
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 1.0)
+    best = max(coarse, key=score)
+    lo, hi = np.clip([best - 1.0, best + 1.0], -max_angle, max_angle)
+    fine = np.arange(lo, hi + 1e-9, 0.1)
+    return float(np.clip(max(fine, key=score), -max_angle, max_angle))
+
+
+def _skew_hough(bw: np.ndarray, max_angle: float) -> float:
+    # 글자들을 가로로 이어서 줄 하나를 굵은 선으로
+    k = max(3, bw.shape[1] // 40)
+    joined = cv2.morphologyEx(bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (k, 1)))
+    edges = cv2.Canny(joined, 50, 150)
+    limit = np.deg2rad(max_angle)
+    lines = cv2.HoughLines(
+        edges,
+        1,
+        np.pi / 1800,
+        threshold=max(10, bw.shape[1] // 4),
+        min_theta=np.pi / 2 - limit,
+        max_theta=np.pi / 2 + limit,
+    )
+    if lines is None:
+        return 0.0
+    # 표 값이 큰 직선부터 나오므로 상위 몇 개의 중앙값 (가로선의 법선 각도는 pi/2)
+    thetas = lines[:50, 0, 1]
+    return float(np.rad2deg(np.median(thetas) - np.pi / 2))
+
+
+def _skew_minarearect(gray: np.ndarray) -> float:
+    # 이진화 (윤곽 검출용)
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    # 글자 영역 좌표 추출 (x, y)
+    coords = cv2.findNonZero(bw)
+    if coords is None:
+        return 0.0
+
+    # 최소 사각형으로 각도 계산
+    # OpenCV 버전마다 각도 범위가 달라서 (-45, 45] 로 맞춤
+    angle = cv2.minAreaRect(coords)[-1]
+    while angle > 45:
+        angle -= 90
+    while angle <= -45:
+        angle += 90
+    return float(angle)
+
+
+def estimate_skew_angle(
+    gray: np.ndarray,
+    method: str = DESKEW_METHOD,
+    max_angle: float = DESKEW_MAX_ANGLE,
+    work_size: int = DESKEW_WORK_SIZE,
+) -> float:
+    """
+    기울기 추정 -> cv2.getRotationMatrix2D 에 그대로 넣으면 똑바로 서는 각도(도)
+    """
+    if method == "minarearect":
+        return _skew_minarearect(gray)
+    bw = _skew_work_image(gray, work_size)
+    if method == "projection":
+        return _skew_projection(bw, max_angle)
+    if method == "hough":
+        return _skew_hough(bw, max_angle)
+    raise ValueError(f"알 수 없는 deskew 방식: {method} (가능: {', '.join(DESKEW_METHODS)})")
+
+
+def rotate_image(gray: np.ndarray, angle: float, dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    dst 를 주면(같은 크기 배열/memmap) 거기에 바로 씀
+    """
+    (h, w) = gray.shape[:2]
+    center = (w // 2, h // 2)
+
+    # 회전 행렬 생성
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(
+        gray,
+        M,
+        (w, h),
+        dst=dst,
+        flags=cv2.INTER_CUBIC,
+        borderMode=cv2.BORDER_REPLICATE,
+    )
+
+
+def deskew(gray: np.ndarray, method: str = DESKEW_METHOD) -> np.ndarray:
+    """
+    이미지의 기울기를 추정해서 자동으로 회전 보정
+    입력: grayscale 이미지 (numpy)
+    출력: 회전 보정된 grayscale 이미지 (기울기가 거의 없으면 입력 그대로)
+    """
+    angle = estimate_skew_angle(gray, method)
+    if abs(angle) < 0.05:
+        return gray
+    return rotate_image(gray, angle)
+
+
+# ----------------------------
+# 단계 정의
+# 각 단계: (이름, 사용 여부 옵션, 이 단계가 쓰는 옵션들, 함수(x, **옵션))
+# 사용 안 하는 단계는 입력을 그대로 넘김
+# ----------------------------
+def _stage_gray(x):
+    # gray를 안 쓰면 이후 단계들이 애매해져서, 최소한 gray 형태로 맞춰준다
+    return cv2.cvtColor(x, cv2.COLOR_RGB2GRAY)
+
+
+def _stage_denoise(x, denoise_strength):
+    # denoise_strength는 홀수여야 함(3,5,7...)
+    k = denoise_strength if denoise_strength % 2 == 1 else denoise_strength + 1
+    return cv2.medianBlur(x, k)
+
+
+def _stage_contrast(x, contrast_alpha, contrast_beta):
+    # x' = alpha*x + beta
+    return cv2.convertScaleAbs(x, alpha=contrast_alpha, beta=contrast_beta)
+
+
+def _stage_binarize(x, thresh):
+    # 고정 임계값 이진화 (원하는 값으로 조절)
+    _, out = cv2.threshold(x, thresh, 255, cv2.THRESH_BINARY)
+    return out
+
+
+def _stage_deskew(x, deskew_method):
+    return deskew(x, deskew_method)
+
+
+STAGES = [
+    ("gray", None, (), _stage_gray),
+    ("denoise", "use_denoise", ("denoise_strength",), _stage_denoise),
+    ("contrast", "use_contrast", ("contrast_alpha", "contrast_beta"), _stage_contrast),
+    ("binarize", "use_binarize", ("thresh",), _stage_binarize),
+    ("deskew", "use_deskew", ("deskew_method",), _stage_deskew),
+]
+
+DEFAULT_PARAMS = {
+    "use_gray": True,
+    "use_denoise": True,
+    "denoise_strength": 5,
+    "use_contrast": True,
+    "contrast_alpha": 1.5,
+    "contrast_beta": 0,
+    "use_binarize": True,
+    "thresh": 160,
+    "use_deskew": True,
+    "deskew_method": DESKEW_METHOD,
+}
+
+
+def _stage_params(stage, params) -> Tuple:
+    _, flag, names, _ = stage
+    enabled = True if flag is None else bool(params[flag])
+    # 꺼진 단계는 세부 옵션이 바뀌어도 결과가 같으므로 키에 넣지 않음
+    return (enabled,) + (tuple(params[n] for n in names) if enabled else ())
+
+
+def _run_stage(stage, x, params):
+    _, flag, names, fn = stage
+    return fn(x, **{n: params[n] for n in names})
+
+
+def preprocess_pipeline(
+    pil_image: Image.Image,
+    use_gray: bool = True,
+    use_denoise: bool = True,
+    denoise_strength: int = 5,
+    use_contrast: bool = True,
+    contrast_alpha: float = 1.5,
+    contrast_beta: int = 0,
+    use_binarize: bool = True,
+    thresh: int = 160,
+    use_deskew: bool = True,
+    deskew_method: str = DESKEW_METHOD,
+) -> Image.Image:
+    """
+    실습과제1 전처리 파이프라인 (옵션형, 캐시 없음)
+    - gray: 컬러 제거(밝기만 남김)
+    - denoise: 잡음 제거(글자 주변 점/얼룩 감소)
+    - contrast: 대비 향상(글자 더 진하게/배경 더 옅게)
+    - binarize: 이진화(배경/글자 흑백 분리)
+    - deskew: 기울기 보정 (deskew_method: projection / hough / minarearect)
+    """
+    gray, _ = preprocess_array(
+        pil_to_np_rgb(pil_image),
+        use_gray=use_gray,
+        use_denoise=use_denoise,
+        denoise_strength=denoise_strength,
+        use_contrast=use_contrast,
+        contrast_alpha=contrast_alpha,
+        contrast_beta=contrast_beta,
+        use_binarize=use_binarize,
+        thresh=thresh,
+        use_deskew=use_deskew,
+        deskew_method=deskew_method,
+    )
+    return np_gray_to_pil(gray)
+
+
+def preprocess_array(rgb: np.ndarray, **params) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    RGB 배열 -> (전처리된 gray 배열, 단계별 [{"stage", "ms"}]) (캐시 없음, 일괄 처리용)
+    params: preprocess_pipeline 과 같은 옵션 (빠진 것은 DEFAULT_PARAMS)
+    """
+    params = {**DEFAULT_PARAMS, **params}
+    x = rgb
+    timings: List[Dict[str, Any]] = []
+    for stage in STAGES:
+        if not _stage_params(stage, params)[0]:
+            continue
+        t0 = time.perf_counter()
+        x = _run_stage(stage, x, params)
+        timings.append({"stage": stage[0], "ms": (time.perf_counter() - t0) * 1000})
+    return x, timings
+
+
+# ----------------------------
+# 단계별 결과 캐시
+# ----------------------------
+# 캐시에 들고 있을 최대 바이트 (A4 300dpi gray 한 장이 약 8.7MB)
+STAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class StageCache:
+    """
+    (이미지 해시, 단계 이름, 이 단계까지의 옵션) -> 결과 배열
+    - 배열 바이트 합계가 max_bytes 를 넘으면 가장 오래 안 쓴 것부터 삭제 (LRU)
+    - 저장한 배열은 여러 rerun/세션이 공유하므로 꺼낸 쪽에서 제자리 수정 금지
+      (cv2 함수들은 새 배열을 돌려주므로 단계 함수는 그대로 써도 됨)
+    """
+
+    def __init__(self, max_bytes: int = STAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            arr = self._items.get(key)
+            if arr is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return arr
+
+    def put(self, key, arr: np.ndarray) -> np.ndarray:
+        if arr.nbytes > self.max_bytes:
+            return arr
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._items[key] = arr
+            self.nbytes += arr.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return arr
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_rgb(data: bytes, cache: StageCache, digest: Optional[str] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    업로드 bytes -> RGB 배열 (캐시 적중 시 디코드 생략)
+    반환: (배열, {"stage": "load", "ms", "cached"})
+    """
+    digest = digest or image_digest(data)
+    key = (digest, "load")
+    t0 = time.perf_counter()
+    rgb = cache.get(key)
+    cached = rgb is not None
+    if rgb is None:
+        rgb = cache.put(key, pil_to_np_rgb(Image.open(io.BytesIO(data))))
+    return rgb, {"stage": "load", "ms": (time.perf_counter() - t0) * 1000, "cached": cached}
+
+
+def preprocess_cached(
+    data: bytes,
+    cache: StageCache,
+    digest: Optional[str] = None,
+    **params,
+) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    캐시를 쓰는 전처리: 옵션이 바뀐 첫 단계부터만 다시 계산
+    - data: 업로드 원본 bytes, params: preprocess_pipeline 과 같은 옵션
+    반환: (결과 gray 배열(캐시와 공유, 수정 금지), 단계별 [{"stage", "ms", "cached"/"off"}])
+    """
+    params = {**DEFAULT_PARAMS, **params}
+    digest = digest or image_digest(data)
+
+    keys = []
+    prefix: Tuple = (digest,)
+    for stage in STAGES:
+        prefix = prefix + (stage[0],) + _stage_params(stage, params)
+        keys.append(prefix)
+
+    # 뒤에서부터 캐시에 있는 가장 마지막 단계를 찾음
+    start, x = 0, None
+    for i in range(len(STAGES) - 1, -1, -1):
+        x = cache.get(keys[i])
+        if x is not None:
+            start = i + 1
+            break
+
+    timings: List[Dict[str, Any]] = []
+    if x is None:
+        x, t = load_rgb(data, cache, digest)
+        timings.append(t)
+    for i, stage in enumerate(STAGES):
+        name = stage[0]
+        if i < start:
+            timings.append({"stage": name, "ms": 0.0, "cached": True})
+            continue
+        if not _stage_params(stage, params)[0]:
+            timings.append({"stage": name, "ms": 0.0, "cached": False, "off": True})
+            continue
+        t0 = time.perf_counter()
+        x = cache.put(keys[i], _run_stage(stage, x, params))
+        timings.append({"stage": name, "ms": (time.perf_counter() - t0) * 1000, "cached": False})
+    return x, timings
+
+
+# ----------------------------
+# 띠(strip) 단위 처리: 아주 큰 스캔(대형 도면, 1200dpi 등)용
+# - 픽셀 단위/국소 연산(gray, median, 대비, 이진화)은 위아래로 겹치는 띠 단위로 계산
+#   (median 은 커널 반지름만큼 위아래 행을 더 읽고 잘라냄 → 전체 처리와 픽셀 단위로 같음)
+# - 중간 결과는 디스크의 np.memmap 에 두고, 기울기 각도는 같은 추정 함수(축소본 사용)로,
+#   회전은 memmap -> memmap 으로 한 번만
+# - 무압축 TIFF 등은 원본을 memmap 으로 바로 읽고, 결과 PNG 는 띠 단위로 이어서 씀
+# ----------------------------
+TILE_STRIP_ROWS = 512
+TILED_MIN_PIXELS = 40_000_000  # 이보다 큰 이미지는 띠 단위로 (A4 1200dpi ≈ 1.4억 픽셀)
+
+
+def _open_rows(path):
+    """
+    이미지 -> (행 단위로 자를 수 있는 배열, 채널 수)
+    무압축(raw) TIFF/PPM/BMP 처럼 픽셀이 파일에 연속으로 있으면 memmap (디코드 없음),
+    아니면 PIL 로 한 번 디코드 (RGB 1장 분량)
+    """
+    pil = Image.open(path)
+    w, h = pil.size
+    channels = {"L": 1, "RGB": 3}.get(pil.mode)
+    tiles = sorted(pil.tile, key=lambda t: t[1][1])
+    contiguous = channels is not None and all(
+        t[0] == "raw"
+        and t[3][0] == pil.mode
+        and (len(t[3]) < 2 or t[3][1] in (0, w * channels))
+        and (len(t[3]) < 3 or t[3][2] == 1)
+        and t[1][0] == 0
+        and t[1][2] == w
+        and t[2] == tiles[0][2] + t[1][1] * w * channels
+        for t in tiles
+    ) and tiles and tiles[0][1][1] == 0 and tiles[-1][1][3] == h
+    if contiguous:
+        pil.close()
+        shape = (h, w) if channels == 1 else (h, w, channels)
+        return np.memmap(path, dtype=np.uint8, mode="r", offset=tiles[0][2], shape=shape), channels
+    with pil:
+        return pil_to_np_rgb(pil), 3
+
+
+def _strip_to_rgb(rows: np.ndarray) -> np.ndarray:
+    # preprocess_pipeline 은 PIL convert("RGB") 후 처리하므로 gray 입력도 RGB 로 맞춤
+    if rows.ndim == 2:
+        return np.repeat(rows[:, :, None], 3, axis=2)
+    return np.ascontiguousarray(rows)
+
+
+class _PngStripWriter:
+    """
+    8비트 gray PNG 를 위에서부터 띠 단위로 이어서 쓰기 (전체 이미지를 메모리에 올리지 않음)
+    """
+
+    def __init__(self, path, width: int, height: int, level: int = 6):
+        import struct
+        import zlib
+
+        self._struct, self._zlib = struct, zlib
+        self._f = open(path, "wb")
+        self._z = zlib.compressobj(level)
+        self._f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self._f.write(self._struct.pack(">I", len(data)))
+        self._f.write(kind)
+        self._f.write(data)
+        self._f.write(self._struct.pack(">I", self._zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def write(self, rows: np.ndarray):
+        # 행마다 필터 종류 0(None) 바이트를 앞에 붙임
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 0
+        filtered[:, 1:] = rows
+        data = self._z.compress(filtered.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self):
+        self._chunk(b"IDAT", self._z.flush())
+        self._chunk(b"IEND", b"")
+        self._f.close()
+
+
+def preprocess_tiled(
+    src_path,
+    dst_path,
+    strip_rows: int = TILE_STRIP_ROWS,
+    tmp_dir=None,
+    preview_width: Optional[int] = None,
+    **params,
+) -> Dict[str, Any]:
+    """
+    큰 스캔을 띠 단위로 전처리해서 dst_path(PNG)에 저장 (preprocess_pipeline 결과와 픽셀 단위로 같음)
+    메모리: 띠 몇 개 분량 + (memmap 이 아닌 입력이면 디코드한 원본 1장)
+    반환: {"angle": 보정 각도 또는 None, "timings": 단계별 [{"stage", "ms"}]}
+    preview_width 를 주면 화면용 축소본(행/열 건너뛰기)도 "original_preview", "preview" 로 반환
+    """
+    import tempfile
+
+    params = {**DEFAULT_PARAMS, **params}
+    flags = {stage[0]: _stage_params(stage, params)[0] for stage in STAGES}
+    timings: List[Dict[str, Any]] = []
+
+    t0 = time.perf_counter()
+    src, _ = _open_rows(src_path)
+    h, w = src.shape[:2]
+    timings.append({"stage": "load", "ms": (time.perf_counter() - t0) * 1000})
+    result: Dict[str, Any] = {}
+    step = -(-w // preview_width) if preview_width else 0
+    if step:
+        result["original_preview"] = _strip_to_rgb(src[::step, ::step])
+
+    # median 은 위아래로 커널 반지름만큼 더 필요
+    k = params["denoise_strength"]
+    k = k if k % 2 == 1 else k + 1
+    halo = k // 2 if flags["denoise"] else 0
+    local = [stage for stage in STAGES if stage[0] != "deskew" and flags[stage[0]]]
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        local_mm = np.memmap(Path(tmp) / "local.u8", dtype=np.uint8, mode="w+", shape=(h, w))
+        t0 = time.perf_counter()
+        for y0 in range(0, h, strip_rows):
+            y1 = min(h, y0 + strip_rows)
+            a0, a1 = max(0, y0 - halo), min(h, y1 + halo)
+            x = _strip_to_rgb(src[a0:a1])
+            for stage in local:
+                x = _run_stage(stage, x, params)
+            local_mm[y0:y1] = x[y0 - a0:y0 - a0 + (y1 - y0)]
+        timings.append({"stage": "local", "ms": (time.perf_counter() - t0) * 1000})
+        del src
+
+        out = local_mm
+        angle = None
+        if flags["deskew"]:
+            t0 = time.perf_counter()
+            angle = estimate_skew_angle(local_mm, params["deskew_method"])
+            timings.append({"stage": "deskew_angle", "ms": (time.perf_counter() - t0) * 1000})
+            if abs(angle) >= 0.05:
+                t0 = time.perf_counter()
+                out = np.memmap(Path(tmp) / "rotated.u8", dtype=np.uint8, mode="w+", shape=(h, w))
+                rotate_image(local_mm, angle, dst=out)
+                timings.append({"stage": "rotate", "ms": (time.perf_counter() - t0) * 1000})
+
+        t0 = time.perf_counter()
+        writer = _PngStripWriter(dst_path, w, h)
+        for y0 in range(0, h, strip_rows):
+            writer.write(out[y0:y0 + strip_rows])
+        writer.close()
+        timings.append({"stage": "write", "ms": (time.perf_counter() - t0) * 1000})
+        if step:
+            result["preview"] = np.ascontiguousarray(out[::step, ::step])
+        del out, local_mm
+
+    result.update(angle=angle, timings=timings)
+    return result
+
+
+# ----------------------------
+# 기울기 추정 방식 비교 (합성 문서를 알려진 각도로 돌려서 정확도/속도 측정)
+#     python doc_preprocess.py [--dpi 300] [--pages 12]
+# ----------------------------
+def _synthetic_page(dpi: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    w, h = int(8.27 * dpi), int(11.69 * dpi)  # A4
+    page = np.full((h, w), 255, np.uint8)
+    scale = dpi / 150
+    line_h = int(28 * scale)
+    margin = int(0.8 * dpi)
+    y = margin
+    while y < h - margin:
+        x = margin
+        while x < w - margin:
+            n = int(rng.integers(2, 10))
+            word = "".join(chr(int(c)) for c in rng.integers(97, 123, n))
+            (tw, _), _ = cv2.getTextSize(word, cv2.FONT_HERSHEY_SIMPLEX, 0.6 * scale, max(1, int(scale)))
+            if x + tw > w - margin:
+                break
+            cv2.putText(page, word, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6 * scale, 0, max(1, int(scale)), cv2.LINE_AA)
+            x += tw + int(10 * scale)
+        y += line_h if rng.random() > 0.1 else line_h * 2  # 가끔 문단 간격
+    return page
+
+
+def _benchmark(dpi: int, pages: int):
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-10, 10, pages)
+    results = {m: {"err": [], "ms": []} for m in DESKEW_METHODS}
+    for i, true_angle in enumerate(angles):
+        page = _synthetic_page(dpi, i)
+        # true_angle 만큼 기울인 스캔 -> 보정 각도는 -true_angle 이어야 함
+        skewed = rotate_image(page, float(true_angle))
+        for m in DESKEW_METHODS:
+            t0 = time.perf_counter()
+            est = estimate_skew_angle(skewed, m)
+            results[m]["ms"].append((time.perf_counter() - t0) * 1000)
+            results[m]["err"].append(abs(est + true_angle))
+
+    print(f"A4 {dpi}dpi 합성 문서 {pages}장, 기울기 -10~10도")
+    print(f"{'method':<12} {'평균 오차(도)':>12} {'최대 오차(도)':>12} {'평균 ms':>10}")
+    for m, r in results.items():
+        print(f"{m:<12} {np.mean(r['err']):>12.3f} {np.max(r['err']):>12.3f} {np.mean(r['ms']):>10.1f}")
+
+    # 범위 밖으로 기울어진 스캔: projection/hough 는 ±DESKEW_MAX_ANGLE 를 넘는 각도를 내면 안 됨
+    page = _synthetic_page(dpi, 0)
+    for true_angle in (DESKEW_MAX_ANGLE + 0.5, -DESKEW_MAX_ANGLE - 0.5, DESKEW_MAX_ANGLE - 0.3):
+        skewed = rotate_image(page, true_angle)
+        for m in ("projection", "hough"):
+            est = estimate_skew_angle(skewed, m)
+            assert abs(est) <= DESKEW_MAX_ANGLE, f"{m}: {est:.2f}도 (max_angle={DESKEW_MAX_ANGLE})"
+    print(f"범위 검사: 추정 각도가 ±{DESKEW_MAX_ANGLE}도 안 (통과)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="deskew 방식별 정확도/속도 비교")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=12)
+    args = parser.parse_args()
+    _benchmark(args.dpi, args.pages)
@@ -0,0 +1,378 @@
+"""
+사진 일괄 저장 (헤드리스)
+
+    python ingest.py <폴더 또는 zip> [--conf 0.25] [--workers 8] [--batch-size 16] [--commit-every 200]
+
+파이프라인 (단계마다 크기 제한 큐로 연결 → 느린 단계가 앞 단계를 자동으로 늦춤):
+  1) 파일 읽기 + 내용 해시 + EXIF + 썸네일 : 스레드 풀 (I/O, 썸네일은 JPEG 축소 디코드)
+  2) 이미지 디코드 + 객체 탐지         : 배치 워커 1개 (YOLO)
+  3) DB 저장                          : 단일 writer, commit_every 장씩 한 트랜잭션
+이미 저장된 파일(같은 내용 해시)은 건너뛰므로 중단 후 다시 실행하면 이어서 진행.
+분석 캐시에 있는 사진은 탐지 단계를 건너뜀.
+이미 저장됐거나 이번 실행에서 먼저 탐지한 사진과 거의 같은 사진(dHash)은
+탐지를 생략하고 그 결과를 재사용, 원본 item 에 연결(dup_of).
+"""
+import argparse
+import queue
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from db import (
+    NEAR_DUP_DISTANCE,
+    close_conn,
+    find_near_duplicate,
+    get_cached_analysis,
+    has_content_hash,
+    init_db,
+    is_informative_phash,
+    insert_photos,
+    link_duplicates,
+    put_cached_analysis,
+)
+from photo_analysis import (
+    analysis_cache_key,
+    content_hash,
+    dhash,
+    generate_photo_keywords,
+    make_thumbnail,
+    reuse_detections,
+)
+from photo_metadata_test import PHOTO_EXTENSIONS, extract_photo_metadata, iter_image_files
+from photo_object_test import DEFAULT_BATCH_SIZE, decode_image, detect_photo_objects_batch
+
+_DONE = object()  # 단계 종료 표시
+
+# 아직 DB 에 없는(이번 실행에서 탐지한) 사진과 비교할 최근 해시 개수 (연사 대비)
+RECENT_PHASH_WINDOW = 512
+
+
+def iter_sources(source):
+    """
+    폴더 또는 zip 에서 (파일 이름, bytes 를 읽는 함수) 를 하나씩 yield
+    """
+    path = Path(source)
+    if path.is_dir():
+        for p in iter_image_files(path):
+            yield str(Path(p).relative_to(path)), Path(p).read_bytes
+    elif zipfile.is_zipfile(path):
+        zf = zipfile.ZipFile(path)
+        for info in zf.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(PHOTO_EXTENSIONS):
+                yield info.filename, (lambda info=info: zf.read(info))
+    else:
+        raise ValueError(f"폴더나 zip 파일이 아닙니다: {source}")
+
+
+class IngestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.read = 0
+        self.skipped = 0
+        self.cached = 0
+        self.detected = 0
+        self.near_dup = 0
+        self.saved = 0
+        self.errors = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def line(self):
+        elapsed = time.perf_counter() - self.started
+        return (
+            f"읽음 {self.read} | 저장 {self.saved} | 건너뜀 {self.skipped} | "
+            f"캐시 {self.cached} | 탐지 {self.detected} | 유사 {self.near_dup} | 오류 {self.errors} | "
+            f"{self.saved / max(elapsed, 1e-9):.1f} images/s"
+        )
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        conf=0.25,
+        workers=8,
+        batch_size=DEFAULT_BATCH_SIZE,
+        commit_every=200,
+        queue_size=64,
+        progress_every=5.0,
+    ):
+        self.conf = conf
+        self.workers = workers
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.progress_every = progress_every
+        self.detect_q = queue.Queue(maxsize=queue_size)
+        self.write_q = queue.Queue(maxsize=queue_size)
+        self.stats = IngestStats()
+        self._seen = set()
+        self._seen_lock = threading.Lock()
+        self._recent = deque(maxlen=RECENT_PHASH_WINDOW)  # (phash, content_hash, objects, object_confs)
+        self._item_ids = {}  # content_hash -> 이번 실행에서 저장한 item id
+        self._failure = None
+
+    # ----------------------------
+    # 1) 읽기 + 해시 + EXIF (스레드 풀)
+    # ----------------------------
+    def _load(self, name, read):
+        try:
+            data = read()
+            digest = content_hash(data)
+            self.stats.add(read=1)
+
+            with self._seen_lock:
+                duplicate = digest in self._seen
+                self._seen.add(digest)
+            if duplicate or has_content_hash(digest):
+                self.stats.add(skipped=1)
+                return None
+
+            job = {"file_name": name, "content_hash": digest, "thumbnail": make_thumbnail(data)}
+            cached = get_cached_analysis(analysis_cache_key(digest, self.conf))
+            if cached is not None:
+                # 탐지를 안 하므로 원본 bytes 는 여기서 버림 (writer 큐에는 썸네일/해시만)
+                job.update(cached)
+                near = find_near_duplicate(cached["phash"])
+                job["dup_of"] = near["item_id"] if near is not None else None
+            else:
+                job["data"] = data
+                job["metadata"] = extract_photo_metadata(data)
+            return job
+        except Exception as e:
+            self.stats.add(errors=1)
+            print(f"[오류] {name}: {type(e).__name__}: {e}")
+            return None
+
+    def _read_stage(self, source):
+        max_pending = self.workers * 4
+        sources = iter_sources(source)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest-read") as pool:
+                pending = set()
+                exhausted = False
+                while True:
+                    while not exhausted and len(pending) < max_pending:
+                        nxt = next(sources, None)
+                        if nxt is None:
+                            exhausted = True
+                            break
+                        pending.add(pool.submit(self._load, *nxt))
+                    if not pending:
+                        break
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        job = fut.result()
+                        if job is None:
+                            continue
+                        if "objects" in job:
+                            # 분석 캐시 적중 → 탐지 생략
+                            self.stats.add(cached=1)
+                            self.write_q.put(job)
+                        else:
+                            # 큐가 가득 차면 여기서 대기 (backpressure)
+                            self.detect_q.put(job)
+        except Exception as e:
+            self._failure = e
+        finally:
+            self.detect_q.put(_DONE)
+
+    # ----------------------------
+    # 2) 디코드 + 배치 탐지
+    # ----------------------------
+    def _detect_stage(self):
+        finished = False
+        try:
+            while not finished:
+                batch = []
+                item = self.detect_q.get()
+                while item is not _DONE:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self.detect_q.get(timeout=0.05)
+                    except queue.Empty:
+                        break
+                finished = item is _DONE
+                if batch:
+                    self._detect_batch(batch)
+        except Exception as e:
+            self._failure = e
+            # 앞 단계가 put 에서 멈추지 않도록 남은 작업을 비움
+            while self.detect_q.get() is not _DONE:
+                pass
+        finally:
+            self.write_q.put(_DONE)
+            close_conn()
+
+    def _detect_batch(self, batch):
+        decoded = []
+        for job in batch:
+            try:
+                img = decode_image(job.pop("data"))
+                job["phash"] = dhash(img)
+            except Exception as e:
+                self.stats.add(errors=1)
+                print(f"[오류] {job['file_name']}: 디코드 실패: {type(e).__name__}: {e}")
+                continue
+            if self._reuse_near_duplicate(job):
+                self._cache(job)
+                self.stats.add(near_dup=1)
+                self.write_q.put(job)
+            else:
+                decoded.append((job, img))
+        if not decoded:
+            return
+        batch = [job for job, _ in decoded]
+
+        try:
+            images = [img for _, img in decoded]
+            results = detect_photo_objects_batch(images, conf=self.conf, batch_size=len(images))
+        except Exception as e:
+            self.stats.add(errors=len(batch))
+            print(f"[오류] 탐지 실패 ({len(batch)}장): {type(e).__name__}: {e}")
+            return
+
+        for job, dets in zip(batch, results):
+            job["objects"] = [d["label"] for d in dets]
+            job["object_confs"] = [d["conf"] for d in dets]
+            self._recent.append((job["phash"], job["content_hash"], job["objects"], job["object_confs"]))
+            self._cache(job)
+            self.stats.add(detected=1)
+            self.write_q.put(job)
+
+    def _cache(self, job):
+        put_cached_analysis(
+            analysis_cache_key(job["content_hash"], self.conf),
+            job["content_hash"],
+            {
+                "metadata": job["metadata"],
+                "phash": job["phash"],
+                "objects": job["objects"],
+                "object_confs": job["object_confs"],
+            },
+        )
+
+    def _reuse_near_duplicate(self, job):
+        """
+        거의 같은 사진이 있으면 탐지 결과를 복사하고 True
+        - DB 에 있으면 dup_of(item id), 이번 실행에서 아직 저장 전이면 dup_hash(내용 해시)로 연결
+        """
+        near = find_near_duplicate(job["phash"])
+        if near is not None:
+            job["objects"], job["object_confs"] = reuse_detections(near, self.conf)
+            job["dup_of"] = near["item_id"]
+            return True
+        if not is_informative_phash(job["phash"]):
+            return False
+        for phash, digest, objects, object_confs in reversed(self._recent):
+            if (phash ^ job["phash"]).bit_count() <= NEAR_DUP_DISTANCE:
+                job["objects"], job["object_confs"] = objects, object_confs
+                job["dup_hash"] = digest
+                return True
+        return False
+
+    # ----------------------------
+    # 3) DB 저장 (단일 writer)
+    # ----------------------------
+    def _flush(self, jobs):
+        records = []
+        links = []  # 같은 묶음 안의 원본을 가리키는 복제본 (저장 후 id 로 연결)
+        for job in jobs:
+            dup_of = job.get("dup_of")
+            if dup_of is None and job.get("dup_hash"):
+                dup_of = self._item_ids.get(job["dup_hash"])
+            meta = job["metadata"]
+            records.append({
+                "file_name": job["file_name"],
+                "taken_date": meta.get("taken_date"),
+                "taken_subsec": meta.get("taken_subsec"),
+                "taken_offset": meta.get("taken_offset"),
+                "camera_make": meta.get("camera_make"),
+                "camera_model": meta.get("camera_model"),
+                "gps_lat": meta.get("gps_lat"),
+                "gps_lon": meta.get("gps_lon"),
+                "objects": job["objects"],
+                "object_confs": job.get("object_confs"),
+                "keywords": generate_photo_keywords(meta, job["objects"]),
+                "content_hash": job["content_hash"],
+                "phash": job["phash"],
+                "dup_of": dup_of,
+                "thumbnail": job.get("thumbnail"),
+            })
+        ids = insert_photos(records, batch_size=self.commit_every)
+        for job, item_id in zip(jobs, ids):
+            self._item_ids[job["content_hash"]] = item_id
+        for job, record, item_id in zip(jobs, records, ids):
+            if record["dup_of"] is None and job.get("dup_hash") in self._item_ids:
+                links.append((item_id, self._item_ids[job["dup_hash"]]))
+        if links:
+            link_duplicates(links)
+        self.stats.add(saved=len(records))
+
+    def run(self, source):
+        init_db()
+        reader = threading.Thread(target=self._read_stage, args=(source,), name="ingest-reader", daemon=True)
+        detector = threading.Thread(target=self._detect_stage, name="ingest-detector", daemon=True)
+        reader.start()
+        detector.start()
+
+        pending = []
+        last_report = time.perf_counter()
+        while True:
+            try:
+                job = self.write_q.get(timeout=self.progress_every)
+            except queue.Empty:
+                job = None
+            if job is _DONE:
+                break
+            if job is not None:
+                pending.append(job)
+            if len(pending) >= self.commit_every:
+                self._flush(pending)
+                pending = []
+            if time.perf_counter() - last_report >= self.progress_every:
+                print(f"[진행] {self.stats.line()}")
+                last_report = time.perf_counter()
+
+        if pending:
+            self._flush(pending)
+        reader.join()
+        detector.join()
+        if self._failure is not None:
+            raise self._failure
+
+        elapsed = time.perf_counter() - self.stats.started
+        print(f"\n[완료] {self.stats.line()}")
+        print(f"소요 {elapsed:.1f}초, 처리량 {self.stats.saved / max(elapsed, 1e-9):.2f} images/s")
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="폴더/zip 의 사진을 분석해서 archive.db 에 일괄 저장")
+    parser.add_argument("source", help="사진 폴더 또는 zip 파일")
+    parser.add_argument("--conf", type=float, default=0.25, help="객체 탐지 신뢰도 임계값")
+    parser.add_argument("--workers", type=int, default=8, help="읽기/EXIF 스레드 수")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="탐지 배치 크기")
+    parser.add_argument("--commit-every", type=int, default=200, help="DB 커밋 단위 (장)")
+    parser.add_argument("--queue-size", type=int, default=64, help="단계 사이 큐 크기")
+    args = parser.parse_args()
+
+    IngestPipeline(
+        conf=args.conf,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        commit_every=args.commit_every,
+        queue_size=args.queue_size,
+    ).run(args.source)
+
+
+if __name__ == "__main__":
+    main()
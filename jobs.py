@@ -0,0 +1,176 @@
+"""
+백그라운드 분석 작업 워커
+
+업로드된 사진은 DB(ingest_jobs)에 쌓이고, 워커 스레드들이 하나씩 가져가
+EXIF/객체 탐지/키워드 생성 후 items 에 저장한다.
+작업 상태가 DB 에 있으므로 Streamlit rerun 이나 앱 재시작 후에도 이어서 처리된다.
+처리 중인 작업에는 워커 풀 id(owner)와 heartbeat 를 남겨서, heartbeat 가 멈춘 작업만
+(= 처리하던 프로세스가 죽은 작업만) 다시 대기열로 돌린다.
+"""
+import atexit
+import os
+import socket
+import threading
+import uuid
+
+from db import (
+    claim_next_job,
+    close_conn,
+    fail_job,
+    find_item_by_content_hash,
+    finish_job,
+    heartbeat_jobs,
+    init_db,
+    insert_photo,
+    requeue_running_jobs,
+    update_job_progress,
+)
+from photo_analysis import analyze_photo, content_hash, make_thumbnail
+from photo_object_test import DetectionBatcher, decode_image
+
+# 동시에 처리할 작업 수 (읽기/EXIF/DB 는 병렬, 객체 탐지는 배처 하나가 모아서 처리)
+JOB_WORKERS = int(os.environ.get("ARCHIVE_JOB_WORKERS", "2"))
+# heartbeat 갱신 / 죽은 작업 확인 주기(초) - db.JOB_STALE_SECONDS 보다 충분히 짧게
+JOB_HEARTBEAT_SECONDS = 15
+
+# 이미 저장된 사진을 다시 올렸을 때 결과로 보여줄 items 컬럼
+EXISTING_META_KEYS = ("taken_date", "camera_make", "camera_model", "gps_lat", "gps_lon")
+
+
+class JobWorkerPool:
+    def __init__(self, workers=JOB_WORKERS, conf=0.25, poll_interval=1.0):
+        self.workers = workers
+        self.conf = conf
+        self.poll_interval = poll_interval
+        self.batcher = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        init_db()
+        requeue_running_jobs()
+        # 모델은 첫 작업이 탐지를 요청할 때 로드됨 (페이지 시작은 막지 않음)
+        self.batcher = DetectionBatcher(conf=self.conf, max_batch=max(1, self.workers))
+
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+        # 프로세스 종료 시 워커/배처 정리 (st.cache_resource 는 따로 정리해 주지 않음)
+        atexit.register(self.close)
+        return self
+
+    def notify(self):
+        """
+        새 작업이 들어왔음을 알림 (대기 중인 워커를 바로 깨움)
+        """
+        self._wake.set()
+
+    def close(self):
+        """
+        워커 스레드를 멈추고(처리 중인 작업은 끝까지) 탐지 배처 종료, 여러 번 불러도 됨
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join()
+        if self.batcher is not None:
+            self.batcher.close()
+        atexit.unregister(self.close)
+
+    stop = close
+
+    def _heartbeat(self):
+        try:
+            while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+                heartbeat_jobs(self.owner)
+                # 다른 프로세스가 처리하다 죽은 작업도 주기적으로 회수
+                if requeue_running_jobs():
+                    self._wake.set()
+        finally:
+            close_conn()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                job = claim_next_job(self.owner)
+                if job is None:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+                    continue
+                self._process(job)
+        finally:
+            close_conn()
+
+    def _process(self, job):
+        job_id = job["id"]
+        try:
+            data = job["data"]
+            digest = content_hash(data)
+
+            # 같은 내용이 이미 저장돼 있으면 새로 넣지 않고 그 item 을 결과로
+            existing = find_item_by_content_hash(digest)
+            if existing is not None:
+                finish_job(
+                    job_id,
+                    {
+                        "metadata": {k: existing[k] for k in EXISTING_META_KEYS},
+                        "objects": existing["objects"],
+                        "keywords": existing["keywords"],
+                        "cached": True,
+                        "dup_of": None,
+                        "existing": True,
+                    },
+                    existing["id"],
+                )
+                return
+            update_job_progress(job_id, 0.2)
+
+            # 분석 캐시에 없을 때만 디코드, 디코드했으면 그 이미지로 썸네일도
+            decoded = []
+
+            def decode():
+                decoded.append(decode_image(data))
+                return decoded[0]
+
+            analysis = analyze_photo(data, conf=self.conf, decoded=decode, batcher=self.batcher, digest=digest)
+            update_job_progress(job_id, 0.8)
+
+            meta = analysis["metadata"]
+            item_id = insert_photo(
+                file_name=job["file_name"],
+                taken_date=meta.get("taken_date"),
+                taken_subsec=meta.get("taken_subsec"),
+                taken_offset=meta.get("taken_offset"),
+                camera_make=meta.get("camera_make"),
+                camera_model=meta.get("camera_model"),
+                gps_lat=meta.get("gps_lat"),
+                gps_lon=meta.get("gps_lon"),
+                objects=analysis["objects"],
+                keywords=analysis["keywords"],
+                object_confs=analysis["object_confs"],
+                content_hash=digest,
+                phash=analysis["phash"],
+                dup_of=analysis["dup_of"],
+                thumbnail=make_thumbnail(decoded[0] if decoded else data),
+            )
+            finish_job(
+                job_id,
+                {
+                    "metadata": meta,
+                    "objects": analysis["objects"],
+                    "keywords": analysis["keywords"],
+                    "cached": analysis["cached"],
+                    "dup_of": analysis["dup_of"],
+                },
+                item_id,
+            )
+        except Exception as e:
+            fail_job(job_id, f"{type(e).__name__}: {e}")
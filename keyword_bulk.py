@@ -0,0 +1,141 @@
+"""
+대량 토크나이즈 (프로세스 풀, 워커마다 Okt/JVM 1개)
+
+Okt 는 JVM 브리지 뒤에 있어서 한 프로세스에서는 코어 1개만 쓴다.
+워커 프로세스마다 1_1452742_sub2.py 를 한 번 불러서(Okt + 사용자 사전 1번 초기화)
+문서를 청크 단위로 나눠 맡기고, 결과는 입력 순서대로 generator 로 돌려준다.
+
+    python keyword_bulk.py [--docs 2000] [--workers 1,2,4,8]    # 속도 비교
+"""
+import importlib.util
+import multiprocessing as mp
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+SUB2_PATH = Path(__file__).parent / "1_1452742_sub2.py"
+DEFAULT_CHUNK_SIZE = 32
+
+_tokenizer = None  # 워커 프로세스 안에서 불러 둔 sub2 모듈
+
+
+def load_tokenizer_module(path=SUB2_PATH):
+    """
+    1_1452742_sub2.py 는 이름이 숫자로 시작해서 import 문으로 못 부르므로 경로로 로드
+    """
+    spec = importlib.util.spec_from_file_location("keyword_sub2", str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _init_worker(module_path):
+    global _tokenizer
+    # 워커의 토큰 캐시는 메모리만: 여러 프로세스가 같은 캐시 DB 파일에 동시에 쓰면 잠김(database is locked)
+    os.environ.pop("OKT_TOKEN_CACHE_DB", None)
+    _tokenizer = load_tokenizer_module(module_path)
+    # JVM + Okt 를 여기서 띄워 둠 (첫 청크가 늦지 않게)
+    _tokenizer.get_okt()
+
+
+def _tokenize_chunk(texts):
+    return [_tokenizer.tokenize_nouns(t) for t in texts]
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_tokenize_nouns(docs, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, max_pending=None, module_path=SUB2_PATH):
+    """
+    문서 iterable -> 문서마다 tokenize_nouns 결과를 입력 순서대로 yield
+    - workers: 프로세스 수 (기본: CPU 코어 수)
+    - chunk_size: 워커에 한 번에 넘기는 문서 수 (프로세스 간 전달 비용 분산)
+    - max_pending: 동시에 맡겨 둘 청크 수 (기본 workers * 2) → 메모리 상한
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    # JVM 이 떠 있는 프로세스를 fork 하면 멈출 수 있어서 spawn 으로 새로 띄움
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(str(module_path),),
+    )
+    try:
+        pending = deque()
+        for chunk in _chunks(docs, chunk_size):
+            pending.append(pool.submit(_tokenize_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # 중간에 generator 를 닫으면 남은 청크는 취소
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ----------------------------
+# 속도 비교: 같은 문서를 워커 수별로 (첫 결과는 한 프로세스에서 순서대로 돌린 것과 비교)
+# ----------------------------
+def _synthetic_docs(n, seed=0):
+    import random
+
+    rng = random.Random(seed)
+    nouns = ["스타벅스", "아메리카노", "영수증", "이마트", "경향신문", "기사", "시장", "기업", "결제", "카드",
+             "할인", "매장", "서울", "회의", "보고서", "일정", "계약", "고객", "상품", "배송"]
+    tails = ["을 샀습니다.", "에서 확인했습니다.", "관련 내용입니다.", "이 포함됩니다.", "를 보관합니다."]
+    docs = []
+    for i in range(n):
+        sentences = [
+            f"{rng.choice(nouns)} {rng.choice(nouns)}{rng.choice(tails)}" for _ in range(rng.randint(5, 15))
+        ]
+        docs.append(f"문서 {i}번. " + " ".join(sentences))  # 문서마다 달라서 토큰 캐시 적중 없음
+    return docs
+
+
+def _benchmark(n_docs, worker_counts):
+    import time
+
+    docs = _synthetic_docs(n_docs)
+
+    sub2 = load_tokenizer_module()
+    sub2.get_okt().pos("준비")
+    t0 = time.perf_counter()
+    expected = [sub2._tokenize_nouns(d) for d in docs]
+    base_s = time.perf_counter() - t0
+    print(f"문서 {n_docs}개, CPU {os.cpu_count()}개")
+    print(f"한 프로세스 순차 : {base_s:7.2f}s ({n_docs / base_s:7.1f} docs/s)")
+
+    for w in worker_counts:
+        t0 = time.perf_counter()
+        got = list(iter_tokenize_nouns(docs, workers=w))
+        elapsed = time.perf_counter() - t0
+        same = "일치" if got == expected else "불일치"
+        print(f"워커 {w:>2}개       : {elapsed:7.2f}s ({n_docs / elapsed:7.1f} docs/s, x{base_s / elapsed:.2f}, 토큰 {same})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="대량 토크나이즈 워커 수별 속도 비교")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--workers", default=None, help="쉼표로 구분 (기본: 1,2,4,...,CPU 수)")
+    args = parser.parse_args()
+
+    if args.workers:
+        counts = [int(w) for w in args.workers.split(",")]
+    else:
+        counts, w = [], 1
+        while w < (os.cpu_count() or 1):
+            counts.append(w)
+            w *= 2
+        counts.append(os.cpu_count() or 1)
+    _benchmark(args.docs, counts)
@@ -0,0 +1,229 @@
+"""
+키워드 추출용 TF-IDF 코퍼스 모델 (디스크 저장, 문서 단위 추가/삭제)
+
+문서마다 코퍼스 전체를 다시 토크나이즈/학습하지 않고,
+단어별 문서 빈도(df)와 어휘(vocab)만 SQLite 에 들고 있다가
+새 문서는 토큰 1번 + 희소 벡터 1번으로 점수를 계산한다.
+
+점수는 sklearn TfidfVectorizer 기본값과 같은 식:
+    tf = 문서 안 등장 횟수, idf = ln((1 + N) / (1 + df)) + 1, L2 정규화
+"""
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+CORPUS_DB_PATH = Path(__file__).parent / "keyword_corpus.db"
+
+
+class CorpusModel:
+    """
+    - add_documents / remove_document 로 코퍼스를 조금씩 바꾸고 바로 디스크에 반영
+    - transform(tokens) : 1 x V 희소 TF-IDF 행 (코퍼스에 없는 단어는 df=0 으로 뒤에 붙임)
+    - top_keywords(tokens, k) : 희소 행에서 바로 상위 k 개
+    path=":memory:" 이면 저장하지 않는 임시 모델
+    """
+
+    def __init__(self, path=CORPUS_DB_PATH):
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._init_schema()
+        self._load()
+
+    def _init_schema(self):
+        self._conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        CREATE TABLE IF NOT EXISTS terms (
+            term_id INTEGER PRIMARY KEY,      -- 0부터 연속 (df 배열 위치)
+            term TEXT NOT NULL UNIQUE,
+            df INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS docs (
+            doc_id TEXT PRIMARY KEY,
+            term_ids BLOB NOT NULL            -- 이 문서의 고유 term_id 들 (uint32 배열)
+        );
+        """)
+
+    def _load(self):
+        self.vocab: Dict[str, int] = {}
+        self.terms: List[str] = []
+        dfs = []
+        for term_id, term, df in self._conn.execute("SELECT term_id, term, df FROM terms ORDER BY term_id"):
+            self.vocab[term] = term_id
+            self.terms.append(term)
+            dfs.append(df)
+        self.df = np.array(dfs, dtype=np.int64)
+        self.n_docs = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        self._idf: Optional[np.ndarray] = None
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return self.n_docs
+
+    def __contains__(self, doc_id):
+        return self._conn.execute("SELECT 1 FROM docs WHERE doc_id = ?", (str(doc_id),)).fetchone() is not None
+
+    # ----------------------------
+    # 코퍼스 변경
+    # ----------------------------
+    # DB 변경은 트랜잭션 안에서, 메모리(vocab/terms/df/n_docs)는 커밋이 끝난 뒤에만 반영
+    # → 중간에 예외가 나면 DB 롤백과 함께 메모리도 그대로
+    def _term_ids(self, terms: Iterable[str], new_terms: Dict[str, int]) -> List[int]:
+        ids = []
+        for t in terms:
+            tid = self.vocab.get(t)
+            if tid is None:
+                tid = new_terms.setdefault(t, len(self.terms) + len(new_terms))
+            ids.append(tid)
+        return ids
+
+    def _remove(self, doc_id: str, df_delta: Counter) -> bool:
+        row = self._conn.execute("SELECT term_ids FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return False
+        df_delta.subtract(np.frombuffer(row[0], dtype=np.uint32).tolist())
+        self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+        return True
+
+    def _write_df(self, df_delta: Counter) -> Dict[int, int]:
+        df_delta = {i: c for i, c in df_delta.items() if c}
+        self._conn.executemany(
+            "UPDATE terms SET df = df + ? WHERE term_id = ?",
+            [(c, i) for i, c in df_delta.items()],
+        )
+        return df_delta
+
+    def _apply(self, new_terms: Dict[str, int], df_delta: Dict[int, int], n_delta: int):
+        if new_terms:
+            for t, tid in sorted(new_terms.items(), key=lambda x: x[1]):
+                self.vocab[t] = tid
+                self.terms.append(t)
+            self.df = np.concatenate([self.df, np.zeros(len(new_terms), dtype=np.int64)])
+        if df_delta:
+            ids = np.fromiter(df_delta.keys(), dtype=np.int64, count=len(df_delta))
+            counts = np.fromiter(df_delta.values(), dtype=np.int64, count=len(df_delta))
+            self.df[ids] += counts
+        self.n_docs += n_delta
+        self._idf = None
+
+    def add_documents(self, docs: Iterable[Tuple[str, Sequence[str]]]) -> int:
+        """
+        (doc_id, 토큰 리스트) 들을 코퍼스에 추가 (같은 doc_id 가 있으면 교체), 한 트랜잭션
+        docs 가 중간에 예외를 내면 아무것도 반영하지 않음
+        반환: 추가한 문서 수
+        """
+        with self._lock:
+            df_delta: Counter = Counter()
+            new_terms: Dict[str, int] = {}
+            n_delta = added = 0
+            batch: Dict[str, List[int]] = {}  # 이번 트랜잭션에서 넣은 문서 (DB 에는 아직 커밋 전)
+            with self._conn:
+                for doc_id, tokens in docs:
+                    doc_id = str(doc_id)
+                    if doc_id in batch:
+                        df_delta.subtract(batch.pop(doc_id))
+                        self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+                        n_delta -= 1
+                    elif self._remove(doc_id, df_delta):
+                        n_delta -= 1
+                    ids = self._term_ids(sorted(set(tokens)), new_terms)
+                    self._conn.execute(
+                        "INSERT INTO docs (doc_id, term_ids) VALUES (?, ?)",
+                        (doc_id, array("I", ids).tobytes()),
+                    )
+                    batch[doc_id] = ids
+                    df_delta.update(ids)
+                    n_delta += 1
+                    added += 1
+
+                if new_terms:
+                    self._conn.executemany(
+                        "INSERT INTO terms (term_id, term, df) VALUES (?, ?, 0)",
+                        [(tid, t) for t, tid in new_terms.items()],
+                    )
+                applied = self._write_df(df_delta)
+            self._apply(new_terms, applied, n_delta)
+        return added
+
+    def add_document(self, doc_id, tokens: Sequence[str]):
+        self.add_documents([(doc_id, tokens)])
+
+    def remove_document(self, doc_id) -> bool:
+        with self._lock:
+            df_delta: Counter = Counter()
+            with self._conn:
+                removed = self._remove(str(doc_id), df_delta)
+                applied = self._write_df(df_delta)
+            self._apply({}, applied, -1 if removed else 0)
+        return removed
+
+    # ----------------------------
+    # 점수 계산
+    # ----------------------------
+    def _idf_for(self, df: np.ndarray) -> np.ndarray:
+        return np.log((1 + self.n_docs) / (1 + df)) + 1.0
+
+    def idf(self) -> np.ndarray:
+        if self._idf is None or len(self._idf) != len(self.df):
+            self._idf = self._idf_for(self.df)
+        return self._idf
+
+    def transform(self, tokens: Sequence[str]) -> Tuple[sparse.csr_matrix, List[str]]:
+        """
+        토큰 -> (1 x 열 개수 희소 TF-IDF 행, 열 번호 -> 단어 리스트)
+        코퍼스 어휘는 term_id 열, 처음 보는 단어는 그 뒤 열(df=0)
+        """
+        counts = Counter(tokens)
+        idf = self.idf()
+        vocab_size = len(self.terms)
+        cols, tf, unseen = [], [], []
+        for term, c in counts.items():
+            tid = self.vocab.get(term)
+            if tid is None:
+                tid = vocab_size + len(unseen)
+                unseen.append(term)
+            cols.append(tid)
+            tf.append(c)
+
+        cols_arr = np.array(cols, dtype=np.int64)
+        tf_arr = np.array(tf, dtype=np.float64)
+        known = cols_arr < vocab_size
+        col_idf = np.full(len(cols_arr), self._idf_for(0))
+        col_idf[known] = idf[cols_arr[known]]
+        data = tf_arr * col_idf
+        norm = np.linalg.norm(data)
+        if norm > 0:
+            data /= norm
+
+        row = sparse.csr_matrix(
+            (data, cols_arr, np.array([0, len(cols_arr)])),
+            shape=(1, vocab_size + len(unseen)),
+        )
+        return row, unseen
+
+    def top_keywords(self, tokens: Sequence[str], top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        문서 토큰의 TF-IDF 상위 top_k -> [(단어, 점수)] (점수 높은 순)
+        """
+        row, unseen = self.transform(tokens)
+        if row.nnz == 0:
+            return []
+        data, cols = row.data, row.indices
+        k = min(top_k, row.nnz)
+        top = np.argpartition(-data, k - 1)[:k]
+        top = top[np.argsort(-data[top], kind="stable")]
+        vocab_size = len(self.terms)
+        return [
+            (self.terms[c] if c < vocab_size else unseen[c - vocab_size], float(data[i]))
+            for i, c in ((i, int(cols[i])) for i in top)
+            if data[i] > 0
+        ]
@@ -0,0 +1,187 @@
+import hashlib
+import io
+
+import photo_object_test
+from db import find_near_duplicate, get_cached_analysis, put_cached_analysis
+from photo_metadata_test import extract_photo_metadata
+from photo_object_test import detect_photo_objects_batch
+
+# 분석 로직(EXIF 처리/객체 탐지 후처리)이 바뀌면 올려서 이전 캐시를 무효화
+# v4: 업로드 bytes 도 EXIF 방향대로 회전한 뒤 탐지/dHash
+ANALYSIS_VERSION = 4
+
+# 썸네일: 긴 변 THUMBNAIL_SIZE px 안에 맞춤, WebP (PIL 에 WebP 가 없으면 JPEG)
+THUMBNAIL_SIZE = 256
+THUMBNAIL_QUALITY = 80
+
+
+def file_content_hash(image_path: str) -> str:
+    """
+    파일 내용의 SHA-256 (파일명/경로와 무관)
+    """
+    h = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_hash(image) -> str:
+    """
+    경로면 파일 내용, bytes/memoryview 면 그 내용의 SHA-256
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(image).hexdigest()
+    return file_content_hash(image)
+
+
+def analysis_cache_key(content_hash: str, conf: float) -> str:
+    """
+    캐시 키: 이미지 내용 + 모델(+백엔드) + conf + 분석 코드 버전
+    """
+    # configure_model() 로 바뀔 수 있으므로 모듈 속성을 매번 읽음
+    model = f"{photo_object_test.MODEL_NAME}@{photo_object_test.DETECTOR_BACKEND}"
+    return f"{content_hash}:{model}:{conf}:v{ANALYSIS_VERSION}"
+
+
+def dhash(pil_image, hash_size: int = 8) -> int:
+    """
+    difference hash (64비트): 9x8 흑백 축소 후 가로로 이웃한 픽셀 밝기 비교
+    리사이즈/재압축/약한 보정에는 거의 그대로, 다른 장면이면 크게 달라짐
+    """
+    from PIL import Image
+
+    small = pil_image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    px = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        base = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (px[base + col] < px[base + col + 1])
+    return value
+
+
+def image_phash(image, decoded=None) -> int:
+    """
+    경로/bytes 또는 디코드된 PIL 이미지(decode_image 결과, EXIF 방향 적용됨)의 dHash
+    """
+    if decoded is not None:
+        return dhash(decoded)
+    from PIL import Image, ImageOps
+
+    src = io.BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+    with Image.open(src) as pil:
+        pil.draft("L", (64, 64))  # JPEG 은 축소 디코드로 충분
+        # decoded 를 넘긴 경우와 같은 값이 되도록 EXIF 방향 적용
+        return dhash(ImageOps.exif_transpose(pil))
+
+
+def make_thumbnail(image, size: int = THUMBNAIL_SIZE) -> bytes:
+    """
+    경로/bytes 또는 이미 디코드한 PIL 이미지(decode_image 결과) -> 썸네일 bytes
+    JPEG 은 draft() 로 DCT 단계에서 1/2~1/8 로 줄여 디코드 (원본 전체 디코드 생략)
+    """
+    from PIL import Image, ImageOps, features
+
+    if isinstance(image, Image.Image):
+        # 복사본 (원본은 탐지에 계속 씀), decode_image 가 EXIF 방향을 이미 적용
+        thumb = image.convert("RGB")
+    else:
+        src = io.BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+        with Image.open(src) as pil:
+            pil.draft("RGB", (size, size))
+            thumb = ImageOps.exif_transpose(pil).convert("RGB")
+    thumb.thumbnail((size, size), Image.LANCZOS)
+
+    out = io.BytesIO()
+    if features.check("webp"):
+        thumb.save(out, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    else:
+        thumb.save(out, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def reuse_detections(near, conf):
+    """
+    거의 같은 사진(find_near_duplicate 결과)의 탐지 결과 재사용 -> (objects, object_confs)
+    같은 모델/conf 의 분석 캐시가 있으면 conf 까지, 없으면 items 의 objects 만
+    """
+    if near["content_hash"]:
+        cached = get_cached_analysis(analysis_cache_key(near["content_hash"], conf))
+        if cached is not None:
+            return cached["objects"], cached.get("object_confs")
+    return near["objects"], None
+
+
+def generate_photo_keywords(metadata: dict, objects: list):
+    keywords = []
+
+    if metadata.get("taken_date"):
+        keywords.append(metadata["taken_date"])
+    if metadata.get("camera_make"):
+        keywords.append(metadata["camera_make"])
+    if metadata.get("camera_model"):
+        keywords.append(metadata["camera_model"])
+
+    if metadata.get("gps_lat") is not None and metadata.get("gps_lon") is not None:
+        keywords.append(f"GPS:{metadata['gps_lat']:.6f},{metadata['gps_lon']:.6f}")
+
+    keywords.extend(objects)
+    keywords = list(dict.fromkeys([str(k).strip() for k in keywords if k]))
+    return keywords
+
+
+def analyze_photo(image, conf=0.25, decoded=None, batcher=None, digest=None):
+    """
+    사진 1장 분석: EXIF 메타데이터 + 객체 탐지 + 키워드
+    같은 내용의 사진은 DB 분석 캐시에서 바로 가져옴 (해시 계산 1번)
+    - image: 파일 경로 또는 인코딩된 이미지 bytes/memoryview (임시 파일 불필요)
+    - decoded: 이미 디코드한 PIL 이미지가 있으면 탐지에 그대로 사용 (재디코드 생략)
+      인자 없는 함수를 주면 캐시에 없을 때만 불러서 디코드 (캐시 적중이면 디코드 안 함)
+    - batcher: DetectionBatcher 를 주면 탐지를 그쪽에 맡김 (여러 스레드가 모델 하나 공유)
+    - digest: 호출한 쪽에서 이미 계산한 content_hash (다시 해시하지 않음)
+    - 이미 저장된 사진과 거의 같으면(dHash 해밍 거리 NEAR_DUP_DISTANCE 이내) 탐지를 생략하고
+      그 사진의 결과를 재사용, "dup_of" 에 원본 item id 를 담음
+    반환: {"content_hash", "phash", "dup_of", "metadata", "objects", "object_confs", "keywords", "cached"}
+    """
+    if batcher is not None and batcher.conf != conf:
+        raise ValueError(f"batcher.conf({batcher.conf}) 와 conf({conf}) 가 다릅니다")
+
+    digest = digest or content_hash(image)
+    key = analysis_cache_key(digest, conf)
+
+    cached = get_cached_analysis(key)
+    if cached is None:
+        if callable(decoded):
+            decoded = decoded()
+        meta = extract_photo_metadata(image)
+        phash = image_phash(image, decoded)
+        near = find_near_duplicate(phash)
+        if near is not None:
+            objects, object_confs = reuse_detections(near, conf)
+        else:
+            target = decoded if decoded is not None else image
+            if batcher is not None:
+                dets = batcher.submit(target).result()
+            else:
+                dets = detect_photo_objects_batch([target], conf=conf, batch_size=1)[0]
+            objects = [d["label"] for d in dets]
+            object_confs = [d["conf"] for d in dets]
+        result = {
+            "metadata": meta,
+            "phash": phash,
+            "objects": objects,
+            "object_confs": object_confs,
+        }
+        put_cached_analysis(key, digest, result)
+    else:
+        result = cached
+        near = find_near_duplicate(result["phash"])
+
+    return {
+        "content_hash": digest,
+        "dup_of": near["item_id"] if near is not None else None,
+        **result,
+        "keywords": generate_photo_keywords(result["metadata"], result["objects"]),
+        "cached": cached is not None,
+    }
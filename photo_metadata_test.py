@@ -1,3 +1,8 @@
+import io
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
 from PIL import Image
 import exifread
 
@@ -20,28 +25,94 @@ def _ratio_to_float(r):
     except Exception:
         return None
 
-def extract_photo_metadata(image_path: str):
+def _convert_to_degrees(values):
+    # values는 [deg, min, sec] Ratio 리스트인 경우가 많음
+    if not values or len(values) < 3:
+        return None
+
+    d = _ratio_to_float(values[0])
+    m = _ratio_to_float(values[1])
+    s = _ratio_to_float(values[2])
+
+    # 하나라도 None이면 GPS 포기(깨진 EXIF)
+    if d is None or m is None or s is None:
+        return None
+
+    return d + (m / 60.0) + (s / 3600.0)
+
+# JPEG APP1(Exif) 세그먼트 최대 크기는 64KB
+_JPEG_SOI = b"\xff\xd8"
+_JPEG_EOI = b"\xff\xd9"
+
+def _read_jpeg_exif_segment(f):
     """
-    사진에서 EXIF 메타데이터 추출:
-    - 촬영일시(DateTimeOriginal)
-    - 카메라 제조사/모델(Make/Model)
-    - GPS(있으면)
+    JPEG 앞부분의 마커만 따라가며 APP1(Exif) 세그먼트까지만 읽음 (이미지 본문은 안 읽음)
+    반환:
+    - bytes: SOI + APP1 + EOI 로 된 최소 JPEG (exifread 에 그대로 전달 가능)
+    - b"": JPEG 이지만 EXIF 없음 (이미지 데이터(SOS) 시작 전까지 APP1 Exif 없음)
+    - None: JPEG 가 아님 (전체 파일 파싱으로 대체)
+    """
+    if f.read(2) != _JPEG_SOI:
+        return None
+
+    while True:
+        header = f.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return b""
+        marker = header[1]
+        if marker in (0xDA, 0xD9):  # SOS / EOI
+            return b""
+
+        length = int.from_bytes(header[2:4], "big")
+        if marker == 0xE1:
+            data = f.read(length - 2)
+            if data.startswith(b"Exif\x00\x00"):
+                return _JPEG_SOI + header + data + _JPEG_EOI
+        else:
+            f.seek(length - 2, 1)
+
+def _read_exif_tags(f):
+    """
+    파일 객체에서 EXIF 태그 읽기
+    JPEG 는 헤더의 EXIF 세그먼트만 읽어서 파싱하고, 그 외 형식은 전체 파일 파싱
     """
+    start = f.tell()
+    segment = _read_jpeg_exif_segment(f)
+    if segment == b"":
+        return {}
+    if segment is not None:
+        tags = exifread.process_file(io.BytesIO(segment), details=False, extract_thumbnail=False)
+        if tags:
+            return tags
+
+    f.seek(start)
+    return exifread.process_file(f, details=False)
+
+def _metadata_from_tags(tags):
     metadata = {
         "taken_date": None,
+        "taken_subsec": None,
+        "taken_offset": None,
         "camera_make": None,
         "camera_model": None,
         "gps_lat": None,
         "gps_lon": None,
     }
 
-    with open(image_path, "rb") as f:
-        tags = exifread.process_file(f, details=False)
-
     # 촬영일시
-    dt = tags.get("EXIF DateTimeOriginal") or tags.get("Image DateTime")
+    dt = tags.get("EXIF DateTimeOriginal")
+    subsec = tags.get("EXIF SubSecTimeOriginal")
+    offset = tags.get("EXIF OffsetTimeOriginal")
+    if not dt:
+        dt = tags.get("Image DateTime")
+        subsec = tags.get("EXIF SubSecTime")
+        offset = tags.get("EXIF OffsetTime")
     if dt:
         metadata["taken_date"] = _safe_str(dt)
+        if subsec:
+            metadata["taken_subsec"] = _safe_str(subsec).strip()
+        if offset:
+            metadata["taken_offset"] = _safe_str(offset).strip()
 
     # 카메라 정보
     mk = tags.get("Image Make")
@@ -57,21 +128,6 @@ def extract_photo_metadata(image_path: str):
     gps_lon = tags.get("GPS GPSLongitude")
     gps_lon_ref = tags.get("GPS GPSLongitudeRef")
 
-    def _convert_to_degrees(values):
-        # values는 [deg, min, sec] Ratio 리스트인 경우가 많음
-        if not values or len(values) < 3:
-            return None
-
-        d = _ratio_to_float(values[0])
-        m = _ratio_to_float(values[1])
-        s = _ratio_to_float(values[2])
-
-        # 하나라도 None이면 GPS 포기(깨진 EXIF)
-        if d is None or m is None or s is None:
-            return None
-
-        return d + (m / 60.0) + (s / 3600.0)
-
     lat = None
     lon = None
 
@@ -94,6 +150,70 @@ def extract_photo_metadata(image_path: str):
 
     return metadata
 
+def extract_photo_metadata(image):
+    """
+    사진에서 EXIF 메타데이터 추출:
+    - 촬영일시(DateTimeOriginal) + 초 이하(SubSecTime)/UTC 오프셋(OffsetTime, 있으면)
+    - 카메라 제조사/모델(Make/Model)
+    - GPS(있으면)
+    image: 파일 경로, bytes/bytearray/memoryview, 또는 읽기 가능한 파일 객체
+    (업로드 파일을 임시 파일로 저장하지 않고 메모리에서 바로 분석 가능)
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        tags = _read_exif_tags(io.BytesIO(image))
+    elif hasattr(image, "read"):
+        tags = _read_exif_tags(image)
+    else:
+        with open(image, "rb") as f:
+            tags = _read_exif_tags(f)
+
+    return _metadata_from_tags(tags)
+
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".heic", ".webp")
+
+def iter_image_files(root, recursive=True):
+    """
+    디렉터리를 돌며 이미지 파일 경로를 하나씩 yield (전체 목록을 미리 만들지 않음)
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from iter_image_files(entry.path, recursive)
+            elif entry.name.lower().endswith(PHOTO_EXTENSIONS):
+                yield entry.path
+
+def _extract_or_error(path):
+    try:
+        return extract_photo_metadata(path)
+    except Exception as e:
+        metadata = _metadata_from_tags({})
+        metadata["error"] = f"{type(e).__name__}: {e}"
+        return metadata
+
+def iter_photo_metadata(paths, max_workers=16, recursive=True):
+    """
+    여러 사진의 EXIF 를 스레드 풀로 병렬 추출해서 (path, metadata) 를 끝나는 순서대로 yield
+    - paths: 디렉터리 경로 하나 또는 파일 경로들의 iterable
+    - 읽기 실패/깨진 파일은 멈추지 않고 metadata["error"] 에 원인을 담아 반환
+    - 동시에 처리 중인 파일 수를 max_workers * 4 개로 제한 (메모리 일정)
+    """
+    if isinstance(paths, (str, os.PathLike)) and os.path.isdir(paths):
+        paths = iter_image_files(paths, recursive)
+
+    path_iter = iter(paths)
+    max_pending = max_workers * 4
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        while True:
+            for path in islice(path_iter, max_pending - len(pending)):
+                pending[pool.submit(_extract_or_error, path)] = path
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield pending.pop(fut), fut.result()
+
 def is_photo_by_exif(metadata: dict):
     """
     EXIF 기준 '사진' 가능성 판단.
@@ -102,7 +222,22 @@ def is_photo_by_exif(metadata: dict):
     return bool(metadata.get("taken_date") or metadata.get("camera_model") or metadata.get("camera_make"))
 
 if __name__ == "__main__":
-    image_path = input("테스트할 이미지 파일 경로를 붙여넣고 Enter: ").strip().strip('"')
+    image_path = input("테스트할 이미지 파일 경로(또는 폴더)를 붙여넣고 Enter: ").strip().strip('"')
+
+    if os.path.isdir(image_path):
+        # 폴더: 병렬 일괄 추출 + 처리 속도
+        import time
+
+        t = time.perf_counter()
+        n = errors = with_gps = 0
+        for path, meta in iter_photo_metadata(image_path):
+            n += 1
+            errors += "error" in meta
+            with_gps += meta["gps_lat"] is not None
+        elapsed = time.perf_counter() - t
+        print(f"\n[일괄 추출] {n}개 파일, GPS {with_gps}개, 오류 {errors}개, "
+              f"{elapsed:.2f}초 ({n / max(elapsed, 1e-9):.0f} files/s)")
+        raise SystemExit
     meta = extract_photo_metadata(image_path)
 
     print("\n[추출된 메타데이터]")
@@ -0,0 +1,337 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# ONNX 변환 결과 저장 위치 (한 번 변환하면 재사용)
+EXPORT_DIR = Path(__file__).parent / "model_cache"
+ONNX_IMGSZ = 640
+LETTERBOX_STRIDE = 32  # torch 경로의 auto 레터박스와 같은 stride
+
+# ONNX Runtime 스레드 수 (0 이면 ORT 기본값 = 물리 코어 수)
+ORT_INTRA_OP_THREADS = int(os.environ.get("ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.environ.get("ORT_INTER_OP_THREADS", "0"))
+
+# ultralytics 기본 후처리 값과 동일하게
+NMS_IOU = 0.7
+MAX_DET = 300
+MAX_NMS = 30000
+MAX_WH = 7680  # 클래스별 NMS 를 위한 박스 offset
+
+
+def export_onnx(weights: str, int8: bool = False, imgsz: int = ONNX_IMGSZ) -> Path:
+    """
+    YOLO 가중치를 ONNX 로 한 번만 변환해서 EXPORT_DIR 에 캐시
+    - int8=True 면 동적 INT8 양자화 모델도 만들어서 그 경로를 반환
+    - 클래스 이름(model.names)은 옆에 *_names.json 으로 저장
+    """
+    EXPORT_DIR.mkdir(exist_ok=True)
+    stem = Path(weights).stem
+    fp32_path = EXPORT_DIR / f"{stem}_{imgsz}.onnx"
+    names_path = EXPORT_DIR / f"{stem}_names.json"
+
+    if not fp32_path.exists() or not names_path.exists():
+        from ultralytics import YOLO
+
+        model = YOLO(weights)
+        out = model.export(format="onnx", imgsz=imgsz, dynamic=True)
+        Path(out).replace(fp32_path)
+        names_path.write_text(
+            json.dumps({int(k): v for k, v in model.names.items()}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+
+    if not int8:
+        return fp32_path
+
+    int8_path = EXPORT_DIR / f"{stem}_{imgsz}_int8.onnx"
+    if not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+def load_names(weights: str) -> dict:
+    names_path = EXPORT_DIR / f"{Path(weights).stem}_names.json"
+    names = json.loads(names_path.read_text(encoding="utf-8"))
+    return {int(k): v for k, v in names.items()}
+
+
+def _letterbox(img: np.ndarray, imgsz: int, stride: int = LETTERBOX_STRIDE):
+    """
+    ultralytics LetterBox(auto=True) 와 같은 방식: 비율 유지 리사이즈 + 회색(114) 패딩
+    torch(.pt) 경로의 predict 처럼 긴 변만 imgsz 에 맞추고 짧은 변은 stride 배수까지만 패딩
+    (그래서 결과 이미지 크기는 사진 비율마다 다름 → predict 에서 크기별로 묶어서 추론)
+    반환: (패딩된 이미지, 배율, (pad_x, pad_y))
+    """
+    h, w = img.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    dw, dh = np.mod(imgsz - new_w, stride) / 2, np.mod(imgsz - new_h, stride) / 2
+
+    if (w, h) != (new_w, new_h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return img, r, (left, top)
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, iou: float) -> np.ndarray:
+    """
+    numpy NMS (boxes: xyxy) -> 남길 인덱스 (점수 내림차순)
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        ovr = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][ovr <= iou]
+    return np.array(keep, dtype=np.int64)
+
+
+def _to_bgr(image) -> np.ndarray:
+    """
+    경로 / PIL 이미지 / numpy(BGR) -> BGR uint8 배열 (ultralytics 와 같은 색 순서)
+    """
+    if isinstance(image, (str, os.PathLike)):
+        img = cv2.imread(os.fspath(image))
+        if img is None:
+            raise FileNotFoundError(f"이미지를 읽을 수 없습니다: {image}")
+        return img
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+class OnnxDetector:
+    """
+    ONNX Runtime(CPU) 기반 YOLO 탐지기
+    predict() 결과 형식은 photo_object_test.detect_photo_objects_batch 와 동일
+    """
+
+    def __init__(
+        self,
+        model_path,
+        names: dict,
+        imgsz: int = ONNX_IMGSZ,
+        intra_op_threads: int = ORT_INTRA_OP_THREADS,
+        inter_op_threads: int = ORT_INTER_OP_THREADS,
+    ):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = intra_op_threads
+        opts.inter_op_num_threads = inter_op_threads
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = names
+        self.imgsz = imgsz
+
+    def warmup(self):
+        self.predict([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def predict(self, images, conf=0.25, iou=NMS_IOU, max_det=MAX_DET):
+        imgs = [_to_bgr(x) for x in images]
+        if not imgs:
+            return []
+
+        # 레터박스 크기가 같은 사진끼리 묶어서 한 번에 추론 (동적 입력 크기 ONNX)
+        groups = {}
+        for i, img in enumerate(imgs):
+            lb, r, pad = _letterbox(img, self.imgsz)
+            chw = lb[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+            groups.setdefault(chw.shape, []).append((i, chw, (r, pad, img.shape[:2])))
+
+        results = [None] * len(imgs)
+        for group in groups.values():
+            x = np.ascontiguousarray(np.stack([chw for _, chw, _ in group]), dtype=np.float32) / 255.0
+            # 출력: (B, 4 + 클래스 수, 후보 수) -> 후보별 (cx, cy, w, h, 클래스 점수...)
+            preds = self.session.run(None, {self.input_name: x})[0].transpose(0, 2, 1)
+            for (i, _, meta), p in zip(group, preds):
+                results[i] = self._postprocess(p, meta, conf, iou, max_det)
+        return results
+
+    def _postprocess(self, pred, meta, conf, iou, max_det):
+        r, (pad_x, pad_y), (h, w) = meta
+
+        cls_scores = pred[:, 4:]
+        cls_ids = cls_scores.argmax(1)
+        scores = cls_scores[np.arange(len(cls_ids)), cls_ids]
+        mask = scores > conf
+        if not mask.any():
+            return []
+
+        cxcywh, scores, cls_ids = pred[mask, :4], scores[mask], cls_ids[mask]
+        if len(scores) > MAX_NMS:
+            top = scores.argsort()[::-1][:MAX_NMS]
+            cxcywh, scores, cls_ids = cxcywh[top], scores[top], cls_ids[top]
+
+        boxes = np.empty_like(cxcywh)
+        boxes[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:] / 2
+        boxes[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:] / 2
+
+        # 클래스별 NMS: 클래스마다 좌표를 멀리 떨어뜨려서 한 번에 처리
+        keep = _nms(boxes + cls_ids[:, None] * MAX_WH, scores, iou)[:max_det]
+        boxes, scores, cls_ids = boxes[keep], scores[keep], cls_ids[keep]
+
+        # 레터박스 좌표 -> 원본 좌표
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / r).clip(0, w)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / r).clip(0, h)
+
+        return [
+            {"label": self.names[int(c)], "conf": float(s), "box": b}
+            for c, s, b in zip(cls_ids.tolist(), scores.tolist(), boxes.tolist())
+        ]
+
+
+def load_onnx_detector(weights: str, int8: bool = False) -> OnnxDetector:
+    """
+    (없으면 변환 후) ONNX 모델을 불러와 워밍업까지 마친 탐지기 반환
+    """
+    path = export_onnx(weights, int8=int8)
+    detector = OnnxDetector(path, load_names(weights))
+    detector.warmup()
+    return detector
+
+
+def _box_iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _match_rate(ref, other, iou=0.5):
+    """
+    ref 탐지 중 같은 라벨 + IoU>=iou 인 짝이 other 에 있는 비율
+    """
+    if not ref:
+        return 1.0
+    used = set()
+    hit = 0
+    for d in ref:
+        for j, o in enumerate(other):
+            if j not in used and o["label"] == d["label"] and _box_iou(d["box"], o["box"]) >= iou:
+                used.add(j)
+                hit += 1
+                break
+    return hit / len(ref)
+
+
+# ----------------------------
+# torch 와의 일치도 검사 (같은 레터박스를 쓰므로 사진마다 라벨과 개수가 정확히 같아야 통과)
+# ----------------------------
+PARITY_IOU = 0.5  # 박스 일치율(참고용 출력)에서 같은 물체로 볼 IoU
+
+
+def _labels(dets):
+    return sorted(d["label"] for d in dets)
+
+
+def _current_config(pot) -> dict:
+    # 비교가 끝나면 원래 설정으로 되돌리기 위해 저장 (configure_model 인자 형식)
+    return {"weights": pot.MODEL_NAME, "device": pot.MODEL_DEVICE, "backend": pot.DETECTOR_BACKEND}
+
+
+def check_parity(image_paths, backend="onnx", conf=0.25):
+    """
+    사진마다 torch 결과와 backend 결과 비교 -> 라벨 목록(개수 포함)이 다른 사진 [(경로, torch 라벨, backend 라벨)]
+    """
+    import photo_object_test as pot
+
+    image_paths = list(image_paths)
+    prev = _current_config(pot)
+    try:
+        pot.configure_model(backend="torch")
+        refs = [pot.detect_photo_objects_batch([p], conf=conf)[0] for p in image_paths]
+        pot.configure_model(backend=backend)
+        outs = [pot.detect_photo_objects_batch([p], conf=conf)[0] for p in image_paths]
+    finally:
+        pot.configure_model(**prev)
+
+    return [
+        (path, _labels(ref), _labels(out))
+        for path, ref, out in zip(image_paths, refs, outs)
+        if _labels(ref) != _labels(out)
+    ]
+
+
+def _compare_interactive(image_path, runs=10):
+    # torch 경로 vs ONNX(FP32/INT8) 결과 일치도 + 지연 시간 비교
+    import photo_object_test as pot
+
+    def _bench(fn):
+        fn()  # 워밍업
+        t = time.perf_counter()
+        for _ in range(runs):
+            out = fn()
+        return out, (time.perf_counter() - t) / runs * 1000
+
+    prev = _current_config(pot)
+    try:
+        pot.configure_model(backend="torch")
+        ref, torch_ms = _bench(lambda: pot.detect_photo_objects_batch([image_path])[0])
+        print(f"\n[torch]     {torch_ms:7.1f} ms/장  탐지 {len(ref)}개")
+
+        for backend in ["onnx", "onnx-int8"]:
+            try:
+                pot.configure_model(backend=backend)
+                dets, ms = _bench(lambda: pot.detect_photo_objects_batch([image_path])[0])
+            except ImportError as e:
+                print(f"[{backend}] 건너뜀: {e}")
+                continue
+            same_labels = _labels(dets) == _labels(ref)
+            print(
+                f"[{backend:9s}] {ms:7.1f} ms/장  탐지 {len(dets)}개  "
+                f"라벨 동일: {'✅' if same_labels else '⚠️'}  "
+                f"박스 일치율(IoU≥{PARITY_IOU}): {_match_rate(ref, dets, PARITY_IOU):.0%}  "
+                f"속도: x{torch_ms / ms:.2f}"
+            )
+    finally:
+        pot.configure_model(**prev)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description="torch 와 ONNX 탐지 결과 비교 (둘 다 auto 레터박스, 라벨과 개수가 같아야 일치)"
+    )
+    parser.add_argument("image", nargs="?", help="사진 1장: 일치도 + 지연 시간 출력 (없으면 경로를 물어봄)")
+    parser.add_argument("--check", metavar="DIR", help="폴더 안 사진 전부 비교, 라벨/개수가 다른 사진이 있으면 종료 코드 1")
+    parser.add_argument("--backend", default="onnx", choices=("onnx", "onnx-int8"), help="--check 대상 백엔드")
+    parser.add_argument("--conf", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.check:
+        from photo_metadata_test import iter_image_files
+
+        paths = sorted(iter_image_files(args.check))
+        if not paths:
+            sys.exit(f"사진이 없습니다: {args.check}")
+        failures = check_parity(paths, backend=args.backend, conf=args.conf)
+        for path, ref_labels, out_labels in failures:
+            print(f"[불일치] {path}: torch {ref_labels} / {args.backend} {out_labels}")
+        print(f"{args.backend}: {len(paths) - len(failures)}/{len(paths)}장 통과 (라벨·개수 동일)")
+        sys.exit(1 if failures else 0)
+
+    image_path = args.image or input("테스트할 사진 파일 경로를 붙여넣고 Enter: ").strip().strip('"')
+    _compare_interactive(image_path)
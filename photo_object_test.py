@@ -1,28 +1,286 @@
-from ultralytics import YOLO
-from PIL import Image
+import os
+import queue
+import threading
+import time
 from collections import Counter
+from concurrent.futures import Future
+from itertools import islice
+
+# 배치 추론 기본 크기 (CPU 기준, 메모리에 맞게 조절)
+DEFAULT_BATCH_SIZE = 16
 
 # YOLOv8n: 가벼워서 노트북에서 돌리기 좋음 (처음 실행 시 모델 다운로드됨)
-model = YOLO("yolov8n.pt")
+# 환경변수로 가중치 경로/장치 변경 가능 (예: YOLO_WEIGHTS=yolov8s.pt YOLO_DEVICE=cpu)
+MODEL_NAME = os.environ.get("YOLO_WEIGHTS", "yolov8n.pt")
+MODEL_DEVICE = os.environ.get("YOLO_DEVICE") or None  # None 이면 ultralytics 가 자동 선택
+
+# 추론 백엔드
+# - "torch": ultralytics(PyTorch) 그대로
+# - "onnx": ONNX 로 한 번 변환(캐시)해서 ONNX Runtime(CPU)으로 추론
+# - "onnx-int8": 위 + 동적 INT8 양자화
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DETECTOR_BACKEND = os.environ.get("YOLO_BACKEND", "torch")
+
+_model = None
+_onnx_detector = None
+_model_lock = threading.Lock()
+
+
+def configure_model(weights: str = None, device: str = None, backend: str = None):
+    """
+    모델 가중치/장치/백엔드 설정 (이미 로드된 모델은 다음 호출 때 다시 로드)
+    """
+    global MODEL_NAME, MODEL_DEVICE, DETECTOR_BACKEND, _model, _onnx_detector
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"backend 는 {BACKENDS} 중 하나여야 합니다: {backend}")
+    with _model_lock:
+        if weights is not None:
+            MODEL_NAME = weights
+        if device is not None:
+            MODEL_DEVICE = device
+        if backend is not None:
+            DETECTOR_BACKEND = backend
+        _model = None
+        _onnx_detector = None
+
+
+def get_model():
+    """
+    프로세스 전체에서 공유하는 YOLO 모델 (처음 호출될 때 한 번만 로드)
+    - ultralytics/torch import 도 이때 일어나므로 탐지가 필요 없는 화면은 빨리 뜸
+    - 여러 스레드가 동시에 불러도 로드는 한 번
+    - 로드 직후 더미 이미지로 한 번 추론해서 첫 요청이 느려지지 않게 워밍업
+    """
+    global _model
+    if _model is not None:
+        return _model
+
+    with _model_lock:
+        if _model is None:
+            import numpy as np
+            from ultralytics import YOLO
+
+            m = YOLO(MODEL_NAME)
+            m.predict(np.zeros((640, 640, 3), dtype=np.uint8), device=MODEL_DEVICE, verbose=False)
+            _model = m
+    return _model
+
+
+def get_onnx_detector():
+    """
+    ONNX 백엔드 탐지기 (처음 호출 시 변환/로드, 이후 공유)
+    """
+    global _onnx_detector
+    if _onnx_detector is not None:
+        return _onnx_detector
+
+    with _model_lock:
+        if _onnx_detector is None:
+            from photo_object_onnx import load_onnx_detector
+
+            _onnx_detector = load_onnx_detector(MODEL_NAME, int8=DETECTOR_BACKEND == "onnx-int8")
+    return _onnx_detector
+
+
+def get_detector():
+    """
+    현재 백엔드(DETECTOR_BACKEND)의 탐지 모델을 미리 로드해서 반환
+    """
+    if DETECTOR_BACKEND == "torch":
+        return get_model()
+    return get_onnx_detector()
+
+
+def __getattr__(name):
+    # 예전 코드의 `photo_object_test.model` 접근 호환 (접근 시점에 로드)
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def decode_image(data):
+    """
+    인코딩된 이미지 bytes -> RGB PIL 이미지 (한 번 디코드해서 미리보기/탐지에 같이 사용)
+    EXIF 방향(Orientation)대로 회전 → 경로로 넘겼을 때(cv2.imread 가 회전 적용)와 같은 입력
+    """
+    import io
+    from PIL import Image, ImageOps
+
+    pil = Image.open(io.BytesIO(data))
+    return ImageOps.exif_transpose(pil).convert("RGB")
+
 
-def detect_photo_objects(image_path: str, conf=0.25):
+def _to_model_input(image):
+    """
+    탐지 입력 정규화
+    - 경로(str/Path), PIL 이미지, numpy 배열(BGR, cv2 와 같은 순서)은 그대로
+    - bytes/bytearray/memoryview 는 PIL 로 디코드
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return decode_image(image)
+    if isinstance(image, os.PathLike):
+        return os.fspath(image)
+    return image
+
+
+def _result_detections(r, names):
+    """
+    ultralytics 결과 1개 -> [{"label", "conf", "box": [x1, y1, x2, y2]}, ...]
+    박스마다 .item() 을 부르지 않고 텐서를 한 번에 리스트로 변환
+    """
+    boxes = r.boxes
+    if boxes is None or len(boxes) == 0:
+        return []
+
+    cls_ids = boxes.cls.int().tolist()
+    confs = boxes.conf.tolist()
+    xyxy = boxes.xyxy.tolist()
+    return [
+        {"label": names[c], "conf": cf, "box": box}
+        for c, cf, box in zip(cls_ids, confs, xyxy)
+    ]
+
+
+def iter_detect_photo_objects_batch(images, conf=0.25, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    여러 이미지를 batch_size 장씩 묶어서 추론, 입력 순서대로 이미지별 탐지 결과를 yield
+    images: 경로/PIL 이미지/numpy 배열/bytes 의 list 또는 iterator
+    """
+    it = iter(images)
+    while True:
+        chunk = [_to_model_input(x) for x in islice(it, batch_size)]
+        if not chunk:
+            return
+
+        if DETECTOR_BACKEND != "torch":
+            yield from get_onnx_detector().predict(chunk, conf=conf)
+            continue
+
+        model = get_model()
+        results = model.predict(
+            chunk,
+            conf=conf,
+            device=MODEL_DEVICE,
+            batch=len(chunk),
+            verbose=False,
+        )
+        for r in results:
+            yield _result_detections(r, model.names)
+
+
+def detect_photo_objects_batch(images, conf=0.25, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    배치 탐지: 이미지별 [{"label", "conf", "box"}, ...] 리스트를 입력 순서대로 반환
+    """
+    return list(iter_detect_photo_objects_batch(images, conf=conf, batch_size=batch_size))
+
+
+def detect_photo_objects(image, conf=0.25):
     """
     사진에서 객체 탐지 후, 객체 이름 리스트 반환
+    image: 경로, bytes/memoryview, PIL 이미지, numpy 배열(BGR) 모두 가능
+    (이미 디코드한 PIL 이미지를 넘기면 다시 디코드하지 않음)
+    """
+    dets = detect_photo_objects_batch([image], conf=conf, batch_size=1)[0]
+    return [d["label"] for d in dets]
+
+
+class DetectionBatcher:
     """
-    results = model.predict(image_path, conf=conf, verbose=False)
-    r = results[0]
+    마이크로 배치 큐: 여러 스레드가 한 장씩 submit() 하면
+    최대 max_batch 장 또는 max_wait 초 동안 모아서 한 번에 추론.
+    submit() 은 Future 를 반환하고 결과는 detect_photo_objects_batch 의 원소 형식.
+
+    사용 예)
+        with DetectionBatcher(conf=0.25) as batcher:
+            fut = batcher.submit("a.jpg")
+            dets = fut.result()
+    """
+
+    def __init__(self, conf=0.25, max_batch=DEFAULT_BATCH_SIZE, max_wait=0.02):
+        self.conf = conf
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="detection-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image) -> Future:
+        fut = Future()
+        with self._close_lock:
+            # close() 뒤에 들어온 요청은 처리할 워커가 없어서 영원히 기다리게 됨
+            if self._closed:
+                raise RuntimeError("DetectionBatcher 가 이미 닫혔습니다")
+            self._queue.put((image, fut))
+        return fut
+
+    def close(self):
+        # 이미 들어온 요청은 모두 처리한 뒤 종료
+        with self._close_lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-    names = model.names  # 클래스 id -> 이름
-    objs = []
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            # 워커가 어떤 이유로든 끝나면 남은 요청은 실패로 돌려줌 (기다리는 쪽이 멈추지 않게)
+            with self._close_lock:
+                self._closed = True
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None and item[1].set_running_or_notify_cancel():
+                    item[1].set_exception(RuntimeError("DetectionBatcher 워커가 종료되었습니다"))
 
-    if r.boxes is None:
-        return objs
+    def _loop(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                return
 
-    for b in r.boxes:
-        cls_id = int(b.cls[0].item())
-        objs.append(names[cls_id])
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
 
-    return objs
+            # 취소된 요청은 제외
+            live = [(img, f) for img, f in batch if f.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                results = detect_photo_objects_batch(
+                    [img for img, _ in live], conf=self.conf, batch_size=len(live)
+                )
+            except Exception as e:
+                for _, f in live:
+                    f.set_exception(e)
+            else:
+                for (_, f), dets in zip(live, results):
+                    f.set_result(dets)
 
 def summarize_objects(objs):
     """
@@ -0,0 +1,115 @@
+"""
+형태소 분석(토크나이즈) 결과 캐시
+
+- 1단계: 프로세스 메모리 LRU (max_entries 개)
+- 2단계(선택): SQLite 파일 - 프로세스를 다시 띄워도 유지
+키 = SHA-1(namespace + 원문), namespace 에는 사용자 사전 버전과 분석 옵션을 넣어서
+사전/옵션이 바뀌면 예전 결과를 자동으로 안 쓰게 한다.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+TOKEN_CACHE_MAX_ENTRIES = 20_000
+
+
+class TokenCache:
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._items: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            # 다른 프로세스(Streamlit 여러 개 등)가 쓰는 중이면 기다렸다가 진행
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS token_cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                tokens TEXT NOT NULL          -- JSON 배열
+            );
+            CREATE INDEX IF NOT EXISTS idx_token_cache_namespace ON token_cache(namespace);
+            """)
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        return hashlib.sha1(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_or_compute(
+        self,
+        text: str,
+        namespace: str,
+        compute: Callable[[str], Sequence[str]],
+    ) -> List[str]:
+        """
+        캐시에 있으면 그대로, 없으면 compute(text) 결과를 저장하고 반환
+        """
+        key = self.make_key(namespace, text)
+        with self._lock:
+            tokens = self._items.get(key)
+            if tokens is not None:
+                self._items.move_to_end(key)
+                self.memory_hits += 1
+                return list(tokens)
+
+        if self._conn is not None:
+            with self._lock:
+                row = self._conn.execute("SELECT tokens FROM token_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                tokens = tuple(json.loads(row[0]))
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, tokens)
+                return list(tokens)
+
+        tokens = tuple(compute(text))
+        with self._lock:
+            self.misses += 1
+            self._remember(key, tokens)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO token_cache (key, namespace, tokens) VALUES (?, ?, ?)",
+                        (key, namespace, json.dumps(tokens, ensure_ascii=False)),
+                    )
+        return list(tokens)
+
+    def _remember(self, key: str, tokens: Tuple[str, ...]):
+        self._items[key] = tokens
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def invalidate(self, keep_namespace: Optional[str] = None):
+        """
+        메모리 캐시 비우기 + (디스크) keep_namespace 가 아닌 예전 결과 삭제
+        """
+        with self._lock:
+            self._items.clear()
+            if self._conn is not None:
+                with self._conn:
+                    if keep_namespace is None:
+                        self._conn.execute("DELETE FROM token_cache")
+                    else:
+                        self._conn.execute("DELETE FROM token_cache WHERE namespace != ?", (keep_namespace,))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+                "entries": len(self._items),
+            }